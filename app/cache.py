@@ -0,0 +1,182 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.config import ServerConfig
+from app.models import UlezResponse
+
+# Hit/miss counters are batched in memory and written at most this often,
+# so requests never queue on SQLite's write lock just to bump a counter
+COUNTER_FLUSH_SECONDS = 5.0
+
+# How often expired rows are swept out of the shared cache file
+PURGE_INTERVAL_SECONDS = 60.0
+
+
+class MemoryCache:
+    """Per-process in-memory result cache with TTL and hit/miss counters"""
+    
+    # Calls never wait on I/O, so they are safe to make on the event loop
+    blocking = False
+    
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[UlezResponse, float]] = {}
+        self._counters: Dict[str, int] = {}
+    
+    def get(self, registration: str) -> Optional[UlezResponse]:
+        """Get cached result if available and not expired"""
+        entry = self.get_entry(registration)
+        return entry[0] if entry else None
+    
+    def get_entry(self, registration: str) -> Optional[Tuple[UlezResponse, float]]:
+        """Cached result and the time it was stored, if not expired"""
+        entry = self._entries.get(registration)
+        if entry is None:
+            return None
+        if time.time() - entry[1] < self.ttl:
+            return entry
+        # Remove expired cache entry
+        del self._entries[registration]
+        return None
+    
+    def set(self, registration: str, result: UlezResponse) -> None:
+        """Cache the result with timestamp"""
+        self._entries[registration] = (result, time.time())
+    
+    def keys(self) -> List[str]:
+        return list(self._entries.keys())
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def incr(self, counter: str) -> None:
+        self._counters[counter] = self._counters.get(counter, 0) + 1
+    
+    def counters(self) -> Dict[str, int]:
+        return dict(self._counters)
+    
+    def close(self) -> None:
+        pass
+
+
+class SqliteCache:
+    """
+    Result cache shared by every worker process on the host.
+    Uses a WAL-mode SQLite file so concurrent readers never block each other.
+    Calls can wait on another worker's write lock, so callers on an event loop
+    should run them in a thread.
+    """
+    
+    blocking = True
+    
+    def __init__(self, ttl: int, path: str):
+        self.ttl = ttl
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (registration TEXT PRIMARY KEY, payload TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self._pending_counters: Dict[str, int] = {}
+        self._last_flush = time.monotonic()
+        self._last_purge = time.monotonic()
+    
+    def get(self, registration: str) -> Optional[UlezResponse]:
+        """Get cached result if available and not expired"""
+        entry = self.get_entry(registration)
+        return entry[0] if entry else None
+    
+    def get_entry(self, registration: str) -> Optional[Tuple[UlezResponse, float]]:
+        """Cached result and the time it was stored, if not expired"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, stored_at FROM results WHERE registration = ?", (registration,)
+            ).fetchone()
+            if row is None:
+                return None
+        payload, stored_at = row
+        if time.time() - stored_at < self.ttl:
+            return UlezResponse.model_validate_json(payload), stored_at
+        # Expired rows are left for _purge_expired so reads never take the write lock
+        return None
+    
+    def set(self, registration: str, result: UlezResponse) -> None:
+        """Cache the result with timestamp, sweeping expired rows now and then"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (registration, payload, stored_at) VALUES (?, ?, ?)",
+                (registration, result.model_dump_json(), now),
+            )
+            if time.monotonic() - self._last_purge >= PURGE_INTERVAL_SECONDS:
+                self._purge_expired(now)
+    
+    def _purge_expired(self, now: float) -> None:
+        """Delete rows past the TTL so the file does not grow without bound (lock held)"""
+        self._conn.execute("DELETE FROM results WHERE stored_at <= ?", (now - self.ttl,))
+        self._last_purge = time.monotonic()
+    
+    def keys(self) -> List[str]:
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT registration FROM results WHERE stored_at > ?", (cutoff,)
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def __len__(self) -> int:
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM results WHERE stored_at > ?", (cutoff,)
+            ).fetchone()[0]
+    
+    def incr(self, counter: str) -> None:
+        with self._lock:
+            self._pending_counters[counter] = self._pending_counters.get(counter, 0) + 1
+            if time.monotonic() - self._last_flush >= COUNTER_FLUSH_SECONDS:
+                self._flush_counters()
+    
+    def _flush_counters(self) -> None:
+        """Write batched counter increments in one transaction (lock held)"""
+        if self._pending_counters:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                list(self._pending_counters.items()),
+            )
+            self._conn.execute("COMMIT")
+            self._pending_counters.clear()
+        self._last_flush = time.monotonic()
+    
+    def counters(self) -> Dict[str, int]:
+        """Totals across all workers, plus this worker's not-yet-flushed increments"""
+        with self._lock:
+            totals = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            for name, value in self._pending_counters.items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+    
+    def close(self) -> None:
+        with self._lock:
+            self._flush_counters()
+            self._conn.close()
+
+
+def create_cache():
+    """Build the cache backend selected by CACHE_BACKEND"""
+    if ServerConfig.CACHE_BACKEND == "sqlite":
+        directory = os.path.dirname(ServerConfig.CACHE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return SqliteCache(ServerConfig.CACHE_TTL, ServerConfig.CACHE_PATH)
+    return MemoryCache(ServerConfig.CACHE_TTL)
@@ -50,4 +50,136 @@ class AntiDetectionConfig:
     @classmethod
     def should_use_proxy(cls) -> bool:
         """Determine if we should use a proxy for this request"""
-        return bool(cls.PROXY_LIST) and os.getenv("USE_PROXY", "false").lower() == "true" 
\ No newline at end of file
+        return bool(cls.PROXY_LIST) and os.getenv("USE_PROXY", "false").lower() == "true" 
+
+class ServerConfig:
+    """Configuration for the production server and shared cache"""
+    
+    HOST = os.getenv("HOST", "0.0.0.0")
+    PORT = int(os.getenv("PORT", "5005"))
+    
+    # Worker processes (0 = size to the CPUs available to this container)
+    WORKERS = int(os.getenv("WEB_CONCURRENCY", "0"))
+    
+    # Seconds to let in-flight requests finish after SIGTERM
+    GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+    
+    # Reload watchers are for local development only
+    RELOAD = os.getenv("RELOAD", "false").lower() == "true"
+    
+    # How long browsers may reuse a result page or API response (back/forward navigation)
+    CLIENT_CACHE_SECONDS = int(os.getenv("CLIENT_CACHE_SECONDS", "300"))
+    
+    # Result cache: "memory" is per-process, "sqlite" is shared by all workers
+    CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+    CACHE_PATH = os.getenv("CACHE_PATH", "/tmp/ulez-cache.sqlite3")
+    
+    @classmethod
+    def available_cpus(cls) -> int:
+        """Count the CPUs this process may actually use (affinity and cgroup quota)"""
+        try:
+            cpus = len(os.sched_getaffinity(0))
+        except AttributeError:
+            cpus = os.cpu_count() or 1
+        
+        # Respect a cgroup v2 CPU quota, e.g. "docker run --cpus=2"
+        try:
+            with open("/sys/fs/cgroup/cpu.max") as f:
+                quota, period = f.read().split()[:2]
+            if quota != "max":
+                cpus = min(cpus, max(1, int(int(quota) / int(period))))
+        except (OSError, ValueError):
+            pass
+        
+        return max(1, cpus)
+    
+    @classmethod
+    def get_workers(cls) -> int:
+        """One event loop per core - the app is I/O bound so more workers just contend"""
+        if cls.WORKERS > 0:
+            return cls.WORKERS
+        return cls.available_cpus()
+
+
+class ProviderConfig:
+    """Configuration for the upstream data-source pipeline"""
+    
+    # "tiered": query providers tier by tier (same priority = raced), stop at the first answer
+    # "race": race every upstream provider at once, heuristics only if all fail
+    # "sequential": one provider at a time, ordered by priority then observed latency
+    RESOLUTION_POLICY = os.getenv("RESOLUTION_POLICY", "tiered").lower()
+    
+    # Motorway ULEZ endpoint
+    MOTORWAY_URL = os.getenv("MOTORWAY_URL", "https://api.motorway.co.uk/platform/v3/ulez/check")
+    MOTORWAY_PRIORITY = int(os.getenv("MOTORWAY_PRIORITY", "10"))
+    MOTORWAY_TIMEOUT = float(os.getenv("MOTORWAY_TIMEOUT", "10"))
+    MOTORWAY_POOL_SIZE = int(os.getenv("MOTORWAY_POOL_SIZE", "10"))
+    
+    # TfL Vehicle API (only registered when TFL_API_KEY is set)
+    TFL_URL = os.getenv("TFL_URL", "https://api.tfl.gov.uk/Vehicle/UlezCompliance")
+    TFL_PRIORITY = int(os.getenv("TFL_PRIORITY", "20"))
+    TFL_TIMEOUT = float(os.getenv("TFL_TIMEOUT", "5"))
+    TFL_POOL_SIZE = int(os.getenv("TFL_POOL_SIZE", "5"))
+    
+    # Longest a lookup spends on upstream providers, whatever the policy,
+    # before moving on to the fallbacks (the registration heuristic)
+    UPSTREAM_DEADLINE = float(os.getenv("UPSTREAM_DEADLINE", "12"))
+    
+    # Generic fallback APIs from AntiDetectionConfig.FALLBACK_APIS
+    FALLBACK_PRIORITY = int(os.getenv("FALLBACK_PRIORITY", "30"))
+    FALLBACK_TIMEOUT = float(os.getenv("FALLBACK_TIMEOUT", "5"))
+    FALLBACK_POOL_SIZE = int(os.getenv("FALLBACK_POOL_SIZE", "5"))
+    
+    # Providers failing this often (after enough calls) drop behind their tier.
+    # Only calls within the health window count, so a demoted provider recovers
+    # once its old failures age out.
+    UNHEALTHY_SUCCESS_RATE = float(os.getenv("UNHEALTHY_SUCCESS_RATE", "0.2"))
+    UNHEALTHY_MIN_CALLS = int(os.getenv("UNHEALTHY_MIN_CALLS", "10"))
+    HEALTH_WINDOW_SECONDS = float(os.getenv("PROVIDER_HEALTH_WINDOW", "300"))
+
+
+class LoggingConfig:
+    """Configuration for application logging"""
+    
+    LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    
+    # "text" for humans, "json" for one structured object per line
+    FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+    
+    # Fraction of per-request INFO/DEBUG lines kept (warnings and errors are never sampled)
+    SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+
+class WatchConfig:
+    """Configuration for fleet watch lists and the change-detection scheduler"""
+    
+    # SQLite file shared by all workers; a lock file beside it elects one scheduler
+    DB_PATH = os.getenv("WATCH_DB_PATH", "/tmp/ulez-watch.sqlite3")
+    
+    # How often each watched plate is re-checked
+    RECHECK_INTERVAL = int(os.getenv("WATCH_RECHECK_INTERVAL", "86400"))
+    
+    # A plate whose lookup failed is tried again after this many seconds
+    RETRY_BACKOFF = int(os.getenv("WATCH_RETRY_BACKOFF", "300"))
+    
+    # Upstream lookups the scheduler may spend per minute, across all watch lists
+    BUDGET_PER_MINUTE = int(os.getenv("WATCH_BUDGET_PER_MINUTE", "30"))
+    
+    # Scheduler wake-up interval in seconds
+    TICK_SECONDS = float(os.getenv("WATCH_TICK_SECONDS", "10"))
+    
+    MAX_REGISTRATIONS = int(os.getenv("WATCH_MAX_REGISTRATIONS", "1000"))
+    WEBHOOK_TIMEOUT = float(os.getenv("WATCH_WEBHOOK_TIMEOUT", "5"))
+    
+    # Hosts webhooks may be delivered to (comma separated). The server makes
+    # these requests itself, so anything else - internal services, cloud
+    # metadata addresses - is refused. Empty disables webhooks.
+    WEBHOOK_ALLOWED_HOSTS: List[str] = [
+        host.strip().lower()
+        for host in os.getenv("WATCH_WEBHOOK_ALLOWED_HOSTS", "").split(",")
+        if host.strip()
+    ]
+    
+    # Longest a change-feed request may long-poll for new changes
+    MAX_WAIT_SECONDS = int(os.getenv("WATCH_MAX_WAIT_SECONDS", "30"))
@@ -0,0 +1,65 @@
+import json
+import logging
+import random
+from datetime import datetime, timezone
+
+from app.config import LoggingConfig
+
+# Per-request lines (cache hits, upstream calls, timings) go through this logger
+# so they can be sampled without touching startup or error logging
+request_logger = logging.getLogger("app.requests")
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# LogRecord attributes that are not user-supplied "extra" fields
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a random fraction of INFO/DEBUG records; warnings and errors always pass.
+    Dropped records are never formatted, so their cost is just the random() call.
+    """
+    
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Structured log sink - one JSON object per line, extra fields included"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging() -> None:
+    """Set up application logging unless the host process already has"""
+    root = logging.getLogger()
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        if LoggingConfig.FORMAT == "json":
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        root.addHandler(handler)
+        root.setLevel(LoggingConfig.LEVEL)
+    
+    if LoggingConfig.SAMPLE_RATE < 1.0 and not request_logger.filters:
+        request_logger.addFilter(SamplingFilter(LoggingConfig.SAMPLE_RATE))
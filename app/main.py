@@ -1,28 +1,40 @@
-from fastapi import FastAPI, HTTPException, Request
+# Imported first so the import phase shows up in the startup report
+from app.startup import startup_report
+
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
+from functools import lru_cache
 import os
 import logging
 import asyncio
 from typing import Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime
 import time
 
-from app.scraper import check_ulez_compliance
+from app.cache import create_cache
+from app.config import ServerConfig, WatchConfig
+from app.logs import configure_logging, request_logger
+from app.models import WatchlistRequest
+from app.scraper import check_ulez_compliance, registry
+from app.watch import WatchScheduler, create_watch_store, webhook_allowed
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+# Logging is configured during startup, not at import time
 logger = logging.getLogger(__name__)
 
-# Simple in-memory cache for results (in production, use Redis)
-cache = {}
-CACHE_TTL = 3600  # 1 hour cache
+# Result cache - in-memory per process, or SQLite shared across workers.
+# Opened during startup; /ready reports not-ready until then.
+cache = None
+CACHE_TTL = ServerConfig.CACHE_TTL
+
+# Headroom over the registry's own lookup budget, so the upstream deadline and
+# the heuristic fallback always run out before the request times out
+LOOKUP_TIMEOUT_MARGIN = 1.0
+
+
+# Fleet watch lists and their background re-check scheduler, opened during startup
+watch_store = None
+watch_scheduler = None
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -40,54 +52,237 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files directory
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+startup_report.record("import", time.perf_counter() - startup_report.created_at)
+
+
+@lru_cache(maxsize=None)
+def get_templates():
+    """Load Jinja2 templates on first use - only the HTML pages need them"""
+    with startup_report.phase("templates", lazy=True):
+        from fastapi.templating import Jinja2Templates
+        return Jinja2Templates(directory="app/templates")
+
 
-# Set up templates
-templates = Jinja2Templates(directory="app/templates")
+async def cache_call(method, *args):
+    """Run a cache method, in a thread for backends that can block on a lock"""
+    if cache.blocking:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
 
 
-def get_cached_result(registration: str):
-    """Get cached result if available and not expired"""
-    if registration in cache:
-        result, timestamp = cache[registration]
-        if datetime.now() - timestamp < timedelta(seconds=CACHE_TTL):
-            return result
-        else:
-            # Remove expired cache entry
-            del cache[registration]
-    return None
+def _lookup_cached(registration: str):
+    entry = cache.get_entry(registration)
+    cache.incr("hits" if entry else "misses")
+    return entry or (None, None)
 
 
-def cache_result(registration: str, result):
+async def get_cached_result(registration: str):
+    """Cached result and the time it was stored, or (None, None) if not cached or expired"""
+    return await cache_call(_lookup_cached, registration)
+
+
+def result_ttl(result, stored_at: float) -> int:
+    """Seconds the result has left in the server cache; estimates are never kept client-side"""
+    if result.estimated:
+        return 0
+    return max(0, int(CACHE_TTL - (time.time() - stored_at)))
+
+
+def client_cache_headers(ttl: int) -> dict:
+    """
+    Let browsers reuse results on back/forward navigation instead of re-requesting,
+    but never beyond the server's own cache entry. X-Result-TTL tells the web UI
+    how long it may keep the result in localStorage.
+    """
+    if ttl <= 0:
+        return {"Cache-Control": "no-store", "X-Result-TTL": "0"}
+    return {
+        "Cache-Control": f"private, max-age={min(ServerConfig.CLIENT_CACHE_SECONDS, ttl)}",
+        "X-Result-TTL": str(ttl),
+    }
+
+
+async def cache_result(registration: str, result):
     """Cache the result with timestamp"""
-    cache[registration] = (result, datetime.now())
+    await cache_call(cache.set, registration, result)
+
+
+async def watch_lookup(registration: str):
+    """
+    Fresh upstream lookup for the watch scheduler. Heuristic estimates are not
+    used, so an upstream outage never shows up as a change to the vehicle.
+    """
+    result = await registry.resolve(registration, include_fallback=False)
+    if result is not None:
+        await cache_result(registration, result)
+    return result
+
+
+@app.on_event("startup")
+async def startup():
+    """Initialise logging, the result cache, upstream pool and watch scheduler, timing each phase"""
+    global cache, watch_store, watch_scheduler
+    
+    with startup_report.phase("logging"):
+        configure_logging()
+    
+    with startup_report.phase("static"):
+        # Startup can run more than once per process (e.g. repeated lifespans in tests)
+        if not any(getattr(route, "name", None) == "static" for route in app.routes):
+            from fastapi.staticfiles import StaticFiles
+            app.mount("/static", StaticFiles(directory="app/static"), name="static")
+    
+    with startup_report.phase("cache"):
+        cache = create_cache()
+    
+    with startup_report.phase("upstream_pool"):
+        await registry.open_all()
+    
+    with startup_report.phase("watch"):
+        watch_store = create_watch_store()
+        watch_scheduler = WatchScheduler(watch_store, watch_lookup)
+        watch_scheduler.start()
+    
+    startup_report.log()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Release the scheduler, upstream pools and stores once in-flight requests have drained"""
+    if watch_scheduler is not None:
+        await watch_scheduler.stop()
+    if watch_store is not None:
+        watch_store.close()
+    await registry.close_all()
+    if cache is not None:
+        cache.close()
 
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Render the home page with the search form"""
-    return templates.TemplateResponse("index.html", {"request": request})
+    return get_templates().TemplateResponse("index.html", {"request": request})
 
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint for monitoring"""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {"status": "healthy", "timestamp": datetime.now().isoformat(), "pid": os.getpid()}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe - only ready once the cache and upstream pool are initialised"""
+    checks = {
+        "cache": cache is not None,
+        "upstream_pool": registry.ready,
+        "watch": watch_store is not None,
+    }
+    ready = all(checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "starting",
+            "checks": checks,
+            "startup_ms": startup_report.as_dict(),
+        },
+    )
 
 
 @app.get("/stats")
 async def get_stats():
-    """Get cache statistics"""
+    """Get cache statistics (shared across workers with the SQLite backend; counters flush every few seconds)"""
+    counters = await cache_call(cache.counters)
     return {
-        "cache_size": len(cache),
-        "cached_registrations": list(cache.keys()),
-        "cache_ttl_seconds": CACHE_TTL
+        "cache_size": await cache_call(len, cache),
+        "cached_registrations": await cache_call(cache.keys),
+        "cache_ttl_seconds": CACHE_TTL,
+        "cache_backend": ServerConfig.CACHE_BACKEND,
+        "cache_hits": counters.get("hits", 0),
+        "cache_misses": counters.get("misses", 0),
+        "worker_pid": os.getpid(),
+        "resolution_policy": registry.policy,
+        # Provider stats are kept per process, unlike the shared cache counters
+        "worker_providers": registry.stats(),
+    }
+
+
+@app.post("/api/watchlists", status_code=201)
+async def create_watchlist(request: WatchlistRequest):
+    """
+    Register a set of registrations to monitor.
+    
+    The scheduler re-checks them in the background; only changes are reported,
+    through the cursor feed at /api/watchlists/{id}/changes and, if given, a
+    POST to webhook_url.
+    """
+    registrations = sorted({
+        registration.strip().upper().replace(" ", "") for registration in request.registrations
+    })
+    if not registrations:
+        raise HTTPException(status_code=400, detail="No registrations supplied")
+    if len(registrations) > WatchConfig.MAX_REGISTRATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {WatchConfig.MAX_REGISTRATIONS} registrations per watch list")
+    invalid = [registration for registration in registrations if len(registration) < 2 or len(registration) > 8]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid registration format: {', '.join(invalid)}")
+    if request.webhook_url and not webhook_allowed(request.webhook_url):
+        raise HTTPException(
+            status_code=400,
+            detail="webhook_url must be an http(s) URL on a host listed in WATCH_WEBHOOK_ALLOWED_HOSTS",
+        )
+    
+    watchlist_id = watch_store.create_watchlist(registrations, request.webhook_url)
+    return watch_store.get_watchlist(watchlist_id)
+
+
+@app.get("/api/watchlists/{watchlist_id}")
+async def get_watchlist(watchlist_id: str):
+    """Watch list details, including the latest change cursor"""
+    watchlist = watch_store.get_watchlist(watchlist_id)
+    if watchlist is None:
+        raise HTTPException(status_code=404, detail="Watch list not found")
+    return watchlist
+
+
+@app.delete("/api/watchlists/{watchlist_id}", status_code=204)
+async def delete_watchlist(watchlist_id: str):
+    """Stop monitoring a watch list and discard its change log"""
+    if not watch_store.delete_watchlist(watchlist_id):
+        raise HTTPException(status_code=404, detail="Watch list not found")
+    return Response(status_code=204)
+
+
+@app.get("/api/watchlists/{watchlist_id}/changes")
+async def get_watchlist_changes(watchlist_id: str, cursor: int = 0, limit: int = 100, wait: int = 0):
+    """
+    Changes detected since the cursor, oldest first.
+    
+    Pass the returned next_cursor back to resume. With wait=N the request
+    long-polls for up to N seconds until a change arrives, so idle fleets
+    cost a client one request per wait period rather than constant polling.
+    """
+    if watch_store.get_watchlist(watchlist_id) is None:
+        raise HTTPException(status_code=404, detail="Watch list not found")
+    limit = max(1, min(limit, 1000))
+    deadline = time.monotonic() + max(0, min(wait, WatchConfig.MAX_WAIT_SECONDS))
+    
+    while True:
+        changes, next_cursor = watch_store.changes_since(watchlist_id, cursor, limit)
+        if changes or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(1)
+    
+    return {
+        "watchlist_id": watchlist_id,
+        "changes": changes,
+        "next_cursor": next_cursor,
+        "has_more": len(changes) == limit,
     }
 
 
 @app.get("/api/{registration}", response_class=JSONResponse)
-async def check_compliance_api(registration: str):
+async def check_compliance_api(registration: str, response: Response):
     """
     Check emission zone compliance for a given vehicle registration via API.
     Now with caching and optimized for speed!
@@ -109,40 +304,42 @@ async def check_compliance_api(registration: str):
             raise HTTPException(status_code=400, detail="Invalid registration format")
         
         # Check cache first
-        cached_result = get_cached_result(registration)
+        cached_result, stored_at = await get_cached_result(registration)
         if cached_result:
-            logger.info(f"Cache hit for {registration} - response time: {time.time() - start_time:.3f}s")
+            request_logger.info("Cache hit for %s - response time: %.3fs", registration, time.time() - start_time)
+            response.headers.update(client_cache_headers(result_ttl(cached_result, stored_at)))
             return cached_result.model_dump() if hasattr(cached_result, 'model_dump') else cached_result
         
         # Get compliance data with timeout
         try:
             result = await asyncio.wait_for(
                 check_ulez_compliance(registration), 
-                timeout=15.0  # 15 second timeout
+                timeout=registry.lookup_budget() + LOOKUP_TIMEOUT_MARGIN
             )
             
             # Cache the result
-            cache_result(registration, result)
+            await cache_result(registration, result)
             
             response_time = time.time() - start_time
-            logger.info(f"API response for {registration} - response time: {response_time:.3f}s")
+            request_logger.info("API response for %s - response time: %.3fs", registration, response_time)
             
             # Return the result as a dictionary for proper JSON serialization
+            response.headers.update(client_cache_headers(result_ttl(result, time.time())))
             return result.model_dump() if hasattr(result, 'model_dump') else result
             
         except asyncio.TimeoutError:
-            logger.error(f"Timeout checking compliance for {registration}")
+            logger.error("Timeout checking compliance for %s", registration)
             raise HTTPException(status_code=504, detail="Request timeout - please try again")
         
     except ValueError as e:
-        logger.warning(f"Invalid registration: {registration} - {str(e)}")
+        logger.warning("Invalid registration: %s - %s", registration, e)
         raise HTTPException(status_code=400, detail=str(e))
         
     except HTTPException:
         raise
         
     except Exception as e:
-        logger.error(f"Error checking compliance for {registration}: {str(e)}")
+        logger.error("Error checking compliance for %s: %s", registration, e)
         raise HTTPException(status_code=500, detail="Error checking compliance")
 
 
@@ -166,7 +363,7 @@ async def check_compliance_html(request: Request, registration: str):
         
         # Validate registration format (basic UK format check)
         if not registration or len(registration) < 2 or len(registration) > 8:
-            return templates.TemplateResponse(
+            return get_templates().TemplateResponse(
                 "result.html", 
                 {
                     "request": request,
@@ -176,28 +373,36 @@ async def check_compliance_html(request: Request, registration: str):
             )
         
         # Check cache first
-        cached_result = get_cached_result(registration)
+        cached_result, stored_at = await get_cached_result(registration)
         if cached_result:
-            logger.info(f"Cache hit for {registration} (HTML) - response time: {time.time() - start_time:.3f}s")
-            return templates.TemplateResponse("result.html", {"request": request, "result": cached_result})
+            request_logger.info("Cache hit for %s (HTML) - response time: %.3fs", registration, time.time() - start_time)
+            ttl = result_ttl(cached_result, stored_at)
+            return get_templates().TemplateResponse(
+                "result.html", {"request": request, "result": cached_result, "result_ttl": ttl},
+                headers=client_cache_headers(ttl),
+            )
         
         # Get compliance data with timeout
         try:
             result = await asyncio.wait_for(
                 check_ulez_compliance(registration), 
-                timeout=15.0  # 15 second timeout
+                timeout=registry.lookup_budget() + LOOKUP_TIMEOUT_MARGIN
             )
             
             # Cache the result
-            cache_result(registration, result)
+            await cache_result(registration, result)
             
             response_time = time.time() - start_time
-            logger.info(f"API response for {registration} (HTML) - response time: {response_time:.3f}s")
+            request_logger.info("API response for %s (HTML) - response time: %.3fs", registration, response_time)
             
-            return templates.TemplateResponse("result.html", {"request": request, "result": result})
+            ttl = result_ttl(result, time.time())
+            return get_templates().TemplateResponse(
+                "result.html", {"request": request, "result": result, "result_ttl": ttl},
+                headers=client_cache_headers(ttl),
+            )
             
         except asyncio.TimeoutError:
-            return templates.TemplateResponse(
+            return get_templates().TemplateResponse(
                 "result.html", 
                 {
                     "request": request,
@@ -207,7 +412,7 @@ async def check_compliance_html(request: Request, registration: str):
             )
             
     except ValueError as e:
-        return templates.TemplateResponse(
+        return get_templates().TemplateResponse(
             "result.html", 
             {
                 "request": request,
@@ -217,8 +422,8 @@ async def check_compliance_html(request: Request, registration: str):
         )
         
     except Exception as e:
-        logger.error(f"Error checking compliance for {registration}: {str(e)}")
-        return templates.TemplateResponse(
+        logger.error("Error checking compliance for %s: %s", registration, e)
+        return get_templates().TemplateResponse(
             "result.html", 
             {
                 "request": request,
@@ -229,6 +434,8 @@ async def check_compliance_html(request: Request, registration: str):
 
 
 if __name__ == "__main__":
-    # Run the application with uvicorn
+    import uvicorn
+    
+    # Development server - use `python -m app.server` for production
     port = int(os.environ.get("PORT", 5005))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
+    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=ServerConfig.RELOAD)
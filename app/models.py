@@ -1,5 +1,17 @@
-from pydantic import BaseModel
-from typing import Optional, Union
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional, Union
+
+
+class ZoneCompliance(BaseModel):
+    """Compliance and charge for a single clean air zone"""
+    # Instances are precomputed and shared between responses
+    model_config = ConfigDict(frozen=True)
+    
+    zone: str
+    name: str
+    compliant: bool
+    charge: Optional[float] = None
+    charge_type: Optional[str] = None  # "daily" charge or "penalty" notice
 
 
 class UlezResponse(BaseModel):
@@ -9,6 +21,40 @@ class UlezResponse(BaseModel):
     make_model: Optional[str] = None
     year: Optional[int] = None
     engine_category: Optional[str] = None
+    fuel_type: Optional[str] = None
     co2_emissions: Optional[Union[int, str]] = None
     charge: Optional[float] = None
     message: Optional[str] = None
+    zones: List[ZoneCompliance] = []
+    # True for registration-pattern estimates made when no upstream answered
+    estimated: bool = False
+
+
+# Upstream Motorway payload. Only the fields UlezResponse needs are declared;
+# pydantic's JSON parser skips everything else without building Python objects.
+
+class MotorwayMake(BaseModel):
+    displayName: Optional[str] = None
+
+
+class MotorwayVehicle(BaseModel):
+    make: Optional[Union[MotorwayMake, str]] = None
+    model: Optional[str] = None
+    year: Optional[int] = None
+    euroStatus: Optional[Union[int, str]] = None
+    fuelType: Optional[str] = None
+    fuel: Optional[str] = None
+    vehicleType: Optional[str] = None
+    emissions: Optional[Union[int, str]] = None
+    isCompliant: Optional[bool] = None
+
+
+class MotorwayEnvelope(BaseModel):
+    status: Optional[str] = None
+    data: Optional[MotorwayVehicle] = None
+
+
+class WatchlistRequest(BaseModel):
+    """Registrations to monitor, and an optional webhook for change pushes"""
+    registrations: List[str]
+    webhook_url: Optional[str] = None
@@ -0,0 +1,352 @@
+import aiohttp
+import asyncio
+import itertools
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.config import AntiDetectionConfig, ProviderConfig
+from app.models import UlezResponse
+from app.zones import evaluate_zones
+
+logger = logging.getLogger(__name__)
+
+# Weight given to the newest sample in the moving-average latency
+LATENCY_EWMA_ALPHA = 0.2
+
+# Priority offset that pushes an unhealthy provider behind its tier
+UNHEALTHY_PRIORITY_PENALTY = 1000
+
+# Upper bound on outcomes kept for the health window
+RECENT_OUTCOMES_LIMIT = 200
+
+
+class ProviderStats:
+    """Per-provider call counts, moving-average latency and recent outcomes"""
+
+    def __init__(self):
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.avg_latency: Optional[float] = None
+        # (monotonic time, success) per call, for health decisions
+        self.recent: Deque[Tuple[float, bool]] = deque(maxlen=RECENT_OUTCOMES_LIMIT)
+
+    def record(self, latency: float, success: bool, timed_out: bool = False) -> None:
+        self.recent.append((time.monotonic(), success))
+        self.calls += 1
+        if success:
+            self.successes += 1
+        else:
+            self.failures += 1
+        if timed_out:
+            self.timeouts += 1
+        if self.avg_latency is None:
+            self.avg_latency = latency
+        else:
+            self.avg_latency = LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * self.avg_latency
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes / self.calls if self.calls else 1.0
+
+    def recent_outcomes(self, window: float) -> List[bool]:
+        """Outcomes of the calls made within the last window seconds"""
+        cutoff = time.monotonic() - window
+        while self.recent and self.recent[0][0] < cutoff:
+            self.recent.popleft()
+        return [success for _, success in self.recent]
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "success_rate": round(self.success_rate, 3),
+            "recent_calls": len(self.recent_outcomes(ProviderConfig.HEALTH_WINDOW_SECONDS)),
+            "avg_latency_ms": round(self.avg_latency * 1000, 1) if self.avg_latency is not None else None,
+        }
+
+
+class DataProvider(ABC):
+    """
+    A source of vehicle compliance data.
+    Subclasses implement fetch() and return None when they cannot answer,
+    letting the registry move on to the next provider.
+    """
+
+    name = "provider"
+
+    def __init__(self, priority: int, timeout: float, pool_size: int = 5, fallback: bool = False):
+        self.priority = priority
+        self.timeout = timeout
+        self.pool_size = pool_size
+        # Fallback providers are only consulted once every upstream provider has failed
+        self.fallback = fallback
+        self.stats = ProviderStats()
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    def create_session(self) -> aiohttp.ClientSession:
+        """Build this provider's own connection pool"""
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            limit_per_host=self.pool_size,
+            ttl_dns_cache=300,
+            use_dns_cache=True,
+        )
+        timeout = aiohttp.ClientTimeout(total=self.timeout, connect=min(3, self.timeout))
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def open(self) -> None:
+        if self.session is None or self.session.closed:
+            self.session = self.create_session()
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    @property
+    def ready(self) -> bool:
+        return self.session is not None and not self.session.closed
+
+    @abstractmethod
+    async def fetch(self, registration: str) -> Optional[UlezResponse]:
+        """Look the registration up, or return None if this provider has no answer"""
+
+
+class TflProvider(DataProvider):
+    """TfL Vehicle API - authoritative for London ULEZ, no Euro status for other zones"""
+
+    name = "tfl"
+
+    def __init__(self, url: str, app_key: str, app_id: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.app_key = app_key
+        self.app_id = app_id
+
+    async def fetch(self, registration: str) -> Optional[UlezResponse]:
+        params = {"vrm": registration, "app_key": self.app_key}
+        if self.app_id:
+            params["app_id"] = self.app_id
+
+        async with self.session.get(self.url, params=params) as response:
+            if response.status != 200:
+                logger.warning("TfL API returned status %d", response.status)
+                return None
+            data = await response.json()
+
+        compliance = str(data.get("compliance", "")).lower()
+        if compliance not in ("compliant", "notcompliant"):
+            return None
+        compliant = compliance == "compliant"
+        make_model = f"{data.get('make') or ''} {data.get('model') or ''}".strip() or None
+        zones = evaluate_zones(vehicle_class=data.get("type"), known_compliance={"london-ulez": compliant})
+
+        return UlezResponse(
+            registration=registration,
+            compliant=compliant,
+            make_model=make_model,
+            charge=None if compliant else 12.50,
+            message=f"Vehicle is {'compliant' if compliant else 'not compliant'} with ULEZ standards",
+            zones=[zone for zone in zones if zone.zone == "london-ulez"],
+        )
+
+
+class FallbackApiProvider(DataProvider):
+    """
+    Generic JSON API from AntiDetectionConfig.FALLBACK_APIS.
+    Called as GET <url>?vrm=<registration> and expected to return UlezResponse fields.
+    """
+
+    def __init__(self, url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.name = f"fallback:{url}"
+
+    async def fetch(self, registration: str) -> Optional[UlezResponse]:
+        async with self.session.get(self.url, params={"vrm": registration}) as response:
+            if response.status != 200:
+                logger.warning("Fallback API %s returned status %d", self.url, response.status)
+                return None
+            data = await response.json()
+
+        if "compliant" not in data:
+            return None
+        data["registration"] = registration
+        return UlezResponse.model_validate(data)
+
+
+class ProviderRegistry:
+    """Holds the configured data providers and resolves lookups across them"""
+
+    POLICIES = ("tiered", "race", "sequential")
+
+    def __init__(self, policy: str = "tiered", upstream_deadline: Optional[float] = None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown resolution policy: {policy}")
+        self.policy = policy
+        # Tiered and sequential lookups would otherwise add up every tier's timeout
+        self.upstream_deadline = upstream_deadline if upstream_deadline is not None else ProviderConfig.UPSTREAM_DEADLINE
+        self.providers: List[DataProvider] = []
+
+    def register(self, provider: DataProvider) -> DataProvider:
+        self.providers.append(provider)
+        return provider
+
+    def get(self, name: str) -> Optional[DataProvider]:
+        for provider in self.providers:
+            if provider.name == name:
+                return provider
+        return None
+
+    async def open_all(self) -> None:
+        for provider in self.providers:
+            await provider.open()
+
+    async def close_all(self) -> None:
+        for provider in self.providers:
+            await provider.close()
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.providers) and all(provider.ready for provider in self.providers)
+
+    def effective_priority(self, provider: DataProvider) -> int:
+        """Configured priority, demoted while calls in the health window are mostly failing"""
+        outcomes = provider.stats.recent_outcomes(ProviderConfig.HEALTH_WINDOW_SECONDS)
+        if (
+            len(outcomes) >= ProviderConfig.UNHEALTHY_MIN_CALLS
+            and sum(outcomes) / len(outcomes) < ProviderConfig.UNHEALTHY_SUCCESS_RATE
+        ):
+            return provider.priority + UNHEALTHY_PRIORITY_PENALTY
+        return provider.priority
+
+    def ordered(self, fallback: bool = False) -> List[DataProvider]:
+        """Providers by effective priority, fastest first within a priority"""
+        candidates = [provider for provider in self.providers if provider.fallback == fallback]
+        return sorted(
+            candidates,
+            key=lambda provider: (
+                self.effective_priority(provider),
+                provider.stats.avg_latency if provider.stats.avg_latency is not None else 0.0,
+            ),
+        )
+
+    def tiers(self) -> List[List[DataProvider]]:
+        """Group upstream providers sharing an effective priority"""
+        return [
+            list(tier)
+            for _, tier in itertools.groupby(self.ordered(), key=self.effective_priority)
+        ]
+
+    async def _call(self, provider: DataProvider, registration: str) -> Optional[UlezResponse]:
+        """Run one provider under its own timeout and record the outcome"""
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(provider.fetch(registration), timeout=provider.timeout)
+        except asyncio.TimeoutError:
+            provider.stats.record(time.perf_counter() - start, success=False, timed_out=True)
+            logger.warning("Provider %s timed out for %s", provider.name, registration)
+            return None
+        except asyncio.CancelledError:
+            # Lost a race - not the provider's fault, so not recorded
+            raise
+        except Exception as e:
+            provider.stats.record(time.perf_counter() - start, success=False)
+            logger.error("Provider %s failed for %s: %s", provider.name, registration, e)
+            return None
+
+        provider.stats.record(time.perf_counter() - start, success=result is not None)
+        return result
+
+    async def _race(self, providers: List[DataProvider], registration: str) -> Optional[UlezResponse]:
+        """Query providers in parallel, return the first answer and cancel the rest"""
+        if len(providers) == 1:
+            return await self._call(providers[0], registration)
+
+        tasks = [asyncio.create_task(self._call(provider, registration)) for provider in providers]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                if result is not None:
+                    return result
+        finally:
+            for task in tasks:
+                task.cancel()
+        return None
+
+    def lookup_budget(self) -> float:
+        """Longest resolve() can take: the upstream deadline plus every fallback's timeout"""
+        return self.upstream_deadline + sum(provider.timeout for provider in self.ordered(fallback=True))
+
+    async def resolve(self, registration: str, include_fallback: bool = True) -> Optional[UlezResponse]:
+        """Resolve a registration using the configured policy within the upstream deadline, then fallbacks"""
+        try:
+            result = await asyncio.wait_for(self._resolve_upstream(registration), timeout=self.upstream_deadline)
+        except asyncio.TimeoutError:
+            logger.warning("Upstream providers missed the %.1fs deadline for %s", self.upstream_deadline, registration)
+            result = None
+
+        if result is not None or not include_fallback:
+            return result
+
+        for provider in self.ordered(fallback=True):
+            result = await self._call(provider, registration)
+            if result is not None:
+                return result
+        return None
+
+    async def _resolve_upstream(self, registration: str) -> Optional[UlezResponse]:
+        if self.policy == "race":
+            groups = [self.ordered()]
+        elif self.policy == "sequential":
+            groups = [[provider] for provider in self.ordered()]
+        else:
+            groups = self.tiers()
+
+        for group in groups:
+            if not group:
+                continue
+            result = await self._race(group, registration)
+            if result is not None:
+                return result
+        return None
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        return {
+            provider.name: {
+                "priority": provider.priority,
+                "effective_priority": self.effective_priority(provider),
+                "timeout_seconds": provider.timeout,
+                "fallback": provider.fallback,
+                **provider.stats.as_dict(),
+            }
+            for provider in self.providers
+        }
+
+
+def register_configured_providers(registry: ProviderRegistry) -> None:
+    """Register the optional providers enabled in app.config"""
+    if AntiDetectionConfig.TFL_API_KEY:
+        registry.register(TflProvider(
+            url=ProviderConfig.TFL_URL,
+            app_key=AntiDetectionConfig.TFL_API_KEY,
+            app_id=AntiDetectionConfig.TFL_APP_ID,
+            priority=ProviderConfig.TFL_PRIORITY,
+            timeout=ProviderConfig.TFL_TIMEOUT,
+            pool_size=ProviderConfig.TFL_POOL_SIZE,
+        ))
+
+    for url in AntiDetectionConfig.FALLBACK_APIS:
+        registry.register(FallbackApiProvider(
+            url=url,
+            priority=ProviderConfig.FALLBACK_PRIORITY,
+            timeout=ProviderConfig.FALLBACK_TIMEOUT,
+            pool_size=ProviderConfig.FALLBACK_POOL_SIZE,
+        ))
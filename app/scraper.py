@@ -1,11 +1,15 @@
 import aiohttp
-import json
 import random
 import asyncio
 from typing import Optional
 import logging
+from pydantic import ValidationError
 
-from app.models import UlezResponse
+from app.config import ProviderConfig
+from app.logs import request_logger
+from app.models import MotorwayEnvelope, MotorwayMake, UlezResponse
+from app.providers import DataProvider, ProviderRegistry, register_configured_providers
+from app.zones import evaluate_zones
 
 logger = logging.getLogger(__name__)
 
@@ -18,113 +22,193 @@ USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/120.0",
 ]
 
+def build_motorway_headers() -> dict:
+    """Rotate user agents and add realistic browser headers"""
+    return {
+        "User-Agent": random.choice(USER_AGENTS),
+        "Accept": "application/json, text/plain, */*",
+        "Accept-Language": "en-US,en;q=0.9",
+        "Accept-Encoding": "gzip, deflate, br",
+        "Referer": "https://motorway.co.uk/ulez-checker",
+        "Origin": "https://motorway.co.uk",
+        "DNT": "1",
+        "Connection": "keep-alive",
+        "Sec-Fetch-Dest": "empty",
+        "Sec-Fetch-Mode": "cors",
+        "Sec-Fetch-Site": "same-site",
+        "Cache-Control": "no-cache",
+        "Pragma": "no-cache",
+        "Content-Type": "application/json",
+    }
 
-async def fetch_ulez_data_direct_api(registration: str) -> Optional[UlezResponse]:
+
+class MotorwayProvider(DataProvider):
     """
     Use the discovered Motorway API endpoint directly for fast ULEZ checking.
     This bypasses browser automation entirely.
     """
-    try:
-        # Clean registration input
-        registration = registration.strip().upper().replace(" ", "")
-        
-        # The actual API endpoint we discovered
-        api_url = "https://api.motorway.co.uk/platform/v3/ulez/check"
-        
-        # Rotate user agents and add realistic headers
-        user_agent = random.choice(USER_AGENTS)
-        headers = {
-            "User-Agent": user_agent,
-            "Accept": "application/json, text/plain, */*",
-            "Accept-Language": "en-US,en;q=0.9",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Referer": "https://motorway.co.uk/ulez-checker",
-            "Origin": "https://motorway.co.uk",
-            "DNT": "1",
-            "Connection": "keep-alive",
-            "Sec-Fetch-Dest": "empty",
-            "Sec-Fetch-Mode": "cors",
-            "Sec-Fetch-Site": "same-site",
-            "Cache-Control": "no-cache",
-            "Pragma": "no-cache",
-            "Content-Type": "application/json",
-        }
-        
+    
+    name = "motorway"
+    
+    def __init__(self, url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+    
+    async def fetch(self, registration: str) -> Optional[UlezResponse]:
         # The payload format we observed from the browser
         payload = {
             "vrm": registration
         }
+        return await _post_ulez_check(self.session, self.url, payload, build_motorway_headers(), registration)
+
+
+class HeuristicProvider(DataProvider):
+    """Registration-pattern estimate - local, never fails, used as the last resort"""
+    
+    name = "heuristic"
+    
+    def __init__(self):
+        super().__init__(priority=1000, timeout=1.0, fallback=True)
+    
+    async def open(self) -> None:
+        pass
+    
+    async def close(self) -> None:
+        pass
+    
+    @property
+    def ready(self) -> bool:
+        return True
+    
+    async def fetch(self, registration: str) -> Optional[UlezResponse]:
+        logger.warning("All upstream providers failed, using enhanced heuristics")
+        return estimate_compliance_heuristic(registration)
+
+
+def build_registry() -> ProviderRegistry:
+    """Motorway first, then any configured TfL/fallback APIs, then heuristics"""
+    registry = ProviderRegistry(policy=ProviderConfig.RESOLUTION_POLICY)
+    registry.register(MotorwayProvider(
+        url=ProviderConfig.MOTORWAY_URL,
+        priority=ProviderConfig.MOTORWAY_PRIORITY,
+        timeout=ProviderConfig.MOTORWAY_TIMEOUT,
+        pool_size=ProviderConfig.MOTORWAY_POOL_SIZE,
+    ))
+    register_configured_providers(registry)
+    registry.register(HeuristicProvider())
+    return registry
+
+
+# Data-source registry; its connection pools are opened at app startup
+registry = build_registry()
+
+
+async def fetch_ulez_data_direct_api(registration: str) -> Optional[UlezResponse]:
+    """
+    Query the Motorway API alone, bypassing the provider pipeline.
+    Uses the provider's pool when the app has opened it, otherwise a throwaway
+    session so standalone scripts still work without the app lifecycle.
+    """
+    registration = registration.strip().upper().replace(" ", "")
+    provider = registry.get("motorway")
+    try:
+        if provider.ready:
+            return await provider.fetch(registration)
         
-        connector = aiohttp.TCPConnector(
-            limit=10,
-            limit_per_host=5,
-            ttl_dns_cache=300,
-            use_dns_cache=True,
-        )
-        
-        timeout = aiohttp.ClientTimeout(total=10, connect=3)
-        
-        async with aiohttp.ClientSession(
-            connector=connector,
-            timeout=timeout,
-            headers=headers
-        ) as session:
-            logger.info(f"Making direct API call for registration: {registration}")
-            
-            async with session.post(api_url, json=payload) as response:
-                logger.info(f"API response status: {response.status}")
-                
-                if response.status == 200:
-                    data = await response.json()
-                    logger.info(f"API response data: {data}")
-                    
-                    # Parse the response using the format we discovered
-                    if data.get('status') == 'success' and 'data' in data:
-                        api_data = data['data']
-                        
-                        # Extract vehicle information
-                        make_display = api_data.get('make', {}).get('displayName', '') if isinstance(api_data.get('make'), dict) else str(api_data.get('make', ''))
-                        model = api_data.get('model', '')
-                        make_model = f"{make_display} {model}".strip() or None
-                        
-                        result = UlezResponse(
-                            registration=registration,
-                            compliant=api_data.get('isCompliant', False),
-                            make_model=make_model,
-                            year=api_data.get('year'),
-                            engine_category=api_data.get('euroStatus'),
-                            co2_emissions=api_data.get('emissions'),
-                            charge=None if api_data.get('isCompliant') else 12.50,
-                            message=f"Vehicle is {'compliant' if api_data.get('isCompliant') else 'not compliant'} with ULEZ standards"
-                        )
-                        
-                        logger.info(f"Successfully parsed API response for {registration}")
-                        return result
-                    else:
-                        logger.warning(f"API returned unexpected format: {data}")
-                        
-                elif response.status == 404:
-                    logger.warning(f"Vehicle not found: {registration}")
-                    return UlezResponse(
-                        registration=registration,
-                        compliant=False,
-                        message="Vehicle not found in database. Please check the registration number."
-                    )
-                elif response.status == 429:
-                    logger.warning(f"Rate limited for: {registration}")
-                    return None  # Let it fall back to heuristics
-                else:
-                    logger.warning(f"API returned status {response.status}")
-                    return None  # Let it fall back to heuristics
+        async with provider.create_session() as session:
+            payload = {"vrm": registration}
+            return await _post_ulez_check(session, provider.url, payload, build_motorway_headers(), registration)
         
     except asyncio.TimeoutError:
-        logger.error(f"API request timed out for {registration}")
+        logger.error("API request timed out for %s", registration)
     except Exception as e:
-        logger.error(f"API request failed for {registration}: {str(e)}")
+        logger.error("API request failed for %s: %s", registration, e)
     
     return None
 
 
+def parse_motorway_response(body: bytes, registration: str) -> Optional[UlezResponse]:
+    """
+    Decode a Motorway response body straight into the fields UlezResponse needs.
+    Unknown fields are skipped by the JSON parser rather than materialised.
+    """
+    try:
+        envelope = MotorwayEnvelope.model_validate_json(body)
+    except ValidationError as e:
+        logger.warning("API returned unexpected format for %s (%d bytes): %s", registration, len(body), e.error_count())
+        return None
+    
+    # Parse the response using the format we discovered
+    api_data = envelope.data
+    if envelope.status != 'success' or api_data is None:
+        logger.warning("API returned unexpected status for %s: %s", registration, envelope.status)
+        return None
+    
+    # Extract vehicle information
+    make_display = api_data.make.displayName if isinstance(api_data.make, MotorwayMake) else api_data.make
+    make_model = f"{make_display or ''} {api_data.model or ''}".strip() or None
+    fuel_type = api_data.fuelType or api_data.fuel
+    compliant = bool(api_data.isCompliant)
+    engine_category = str(api_data.euroStatus) if api_data.euroStatus is not None else None
+    
+    # Every other zone is evaluated locally from the same record;
+    # Motorway's verdict stays authoritative for London
+    zones = evaluate_zones(
+        euro_status=api_data.euroStatus,
+        fuel_type=fuel_type,
+        year=api_data.year,
+        vehicle_class=api_data.vehicleType,
+        known_compliance={"london-ulez": compliant},
+    )
+    
+    return UlezResponse(
+        registration=registration,
+        compliant=compliant,
+        make_model=make_model,
+        year=api_data.year,
+        engine_category=engine_category,
+        fuel_type=fuel_type,
+        co2_emissions=api_data.emissions,
+        charge=None if compliant else 12.50,
+        message=f"Vehicle is {'compliant' if compliant else 'not compliant'} with ULEZ standards",
+        zones=zones,
+    )
+
+
+async def _post_ulez_check(
+    session: aiohttp.ClientSession,
+    api_url: str,
+    payload: dict,
+    headers: dict,
+    registration: str,
+) -> Optional[UlezResponse]:
+    """POST a registration to the Motorway ULEZ endpoint and parse the reply"""
+    request_logger.info("Making direct API call for registration: %s", registration)
+    
+    async with session.post(api_url, json=payload, headers=headers) as response:
+        request_logger.info("API response status for %s: %d", registration, response.status)
+        
+        if response.status == 200:
+            body = await response.read()
+            if request_logger.isEnabledFor(logging.DEBUG):
+                request_logger.debug("API response body for %s: %s", registration, body[:2048])
+            return parse_motorway_response(body, registration)
+            
+        elif response.status == 404:
+            logger.warning("Vehicle not found: %s", registration)
+            return UlezResponse(
+                registration=registration,
+                compliant=False,
+                message="Vehicle not found in database. Please check the registration number."
+            )
+        elif response.status == 429:
+            logger.warning("Rate limited for: %s", registration)
+            return None  # Let it fall back to heuristics
+        else:
+            logger.warning("API returned status %d for %s", response.status, registration)
+            return None  # Let it fall back to heuristics
+
+
 def estimate_compliance_heuristic(registration: str) -> UlezResponse:
     """
     Enhanced heuristic fallback based on UK registration patterns.
@@ -150,7 +234,7 @@ def estimate_compliance_heuristic(registration: str) -> UlezResponse:
                 else:
                     estimated_year = 2001 + (age_num - 50)
                 
-                logger.info(f"Parsed registration {registration}: age_code={age_code}, estimated_year={estimated_year}")
+                request_logger.debug("Parsed registration %s: age_code=%s, estimated_year=%s", registration, age_code, estimated_year)
                 
                 # ULEZ compliance estimation
                 if estimated_year >= 2015:  # Euro 6 diesel generally from 2015
@@ -161,15 +245,15 @@ def estimate_compliance_heuristic(registration: str) -> UlezResponse:
                     estimated_compliant = False
             else:
                 # Might be an older format or special plate
-                logger.info(f"Non-numeric age code for {registration}: {age_code}")
+                request_logger.debug("Non-numeric age code for %s: %s", registration, age_code)
                 estimated_compliant = False
         else:
             # Too short to be a standard UK plate
-            logger.info(f"Registration too short: {registration}")
+            request_logger.debug("Registration too short: %s", registration)
             estimated_compliant = False
                 
     except Exception as e:
-        logger.warning(f"Error parsing registration {registration}: {str(e)}")
+        logger.warning("Error parsing registration %s: %s", registration, e)
         estimated_compliant = False
     
     return UlezResponse(
@@ -180,6 +264,9 @@ def estimate_compliance_heuristic(registration: str) -> UlezResponse:
         engine_category=None,
         co2_emissions=None,
         charge=12.50 if not estimated_compliant else None,
+        # Same petrol assumption as the ULEZ estimate above
+        zones=evaluate_zones(fuel_type="petrol", year=estimated_year, known_compliance={"london-ulez": estimated_compliant}),
+        estimated=True,
         message=f"Estimated result based on registration pattern. {'Likely compliant' if estimated_compliant else 'Likely non-compliant - may need to pay £12.50 daily charge'}. Please verify with official TfL checker."
     )
 
@@ -197,21 +284,26 @@ async def check_ulez_compliance(registration: str, show_browser: bool = False) -
         if not registration or len(registration) < 2 or len(registration) > 8:
             raise ValueError("Invalid registration format")
         
-        logger.info(f"Checking ULEZ compliance for registration: {registration}")
+        request_logger.info("Checking ULEZ compliance for registration: %s", registration)
         
-        # Try direct API call first (much faster!)
-        logger.info("Attempting direct API call...")
-        result = await fetch_ulez_data_direct_api(registration)
-        if result:
-            logger.info("Successfully got result from direct API call")
-            return result
+        # Providers are tried per the resolution policy; heuristics are the last resort
+        if registry.ready:
+            result = await registry.resolve(registration)
+        else:
+            # Standalone scripts never run the app startup hook. They get a
+            # private registry with short-lived pools rather than opening and
+            # closing the shared one under concurrent callers.
+            lookup_registry = build_registry()
+            await lookup_registry.open_all()
+            try:
+                result = await lookup_registry.resolve(registration)
+            finally:
+                await lookup_registry.close_all()
         
-        # Enhanced heuristic fallback if API fails
-        logger.warning("Direct API failed, using enhanced heuristics")
-        return estimate_compliance_heuristic(registration)
+        return result or estimate_compliance_heuristic(registration)
         
     except ValueError as e:
         raise e
     except Exception as e:
-        logger.error(f"Error checking compliance for {registration}: {str(e)}")
+        logger.error("Error checking compliance for %s: %s", registration, e)
         raise Exception(f"Error checking ULEZ compliance: {str(e)}")
@@ -0,0 +1,50 @@
+"""
+Production entry point: runs N uvicorn workers sized to the available cores.
+
+    python -m app.server
+
+SIGTERM is forwarded to every worker, which stops accepting new connections
+and drains in-flight requests for up to GRACEFUL_TIMEOUT seconds.
+"""
+
+import os
+import logging
+
+import uvicorn
+
+from app.config import ServerConfig
+from app.logs import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    workers = ServerConfig.get_workers()
+    
+    # Workers are separate processes, so the per-process memory cache would
+    # split hits and stats N ways. Share one on-disk cache unless told otherwise.
+    if workers > 1 and "CACHE_BACKEND" not in os.environ:
+        os.environ["CACHE_BACKEND"] = "sqlite"
+    
+    # Same handler setup as the workers, so LOG_LEVEL and LOG_FORMAT apply
+    # here and in the single-worker case where the app runs in this process
+    configure_logging()
+    logger.info(
+        "Starting %d worker(s) on %s:%d (cache backend: %s)",
+        workers, ServerConfig.HOST, ServerConfig.PORT,
+        os.environ.get("CACHE_BACKEND", ServerConfig.CACHE_BACKEND),
+    )
+    
+    uvicorn.run(
+        "app.main:app",
+        host=ServerConfig.HOST,
+        port=ServerConfig.PORT,
+        workers=workers,
+        reload=False,
+        proxy_headers=True,
+        timeout_graceful_shutdown=ServerConfig.GRACEFUL_TIMEOUT,
+    )
+
+
+if __name__ == "__main__":
+    main()
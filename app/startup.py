@@ -0,0 +1,44 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """Records how long each startup phase takes so cold starts can be profiled"""
+    
+    def __init__(self):
+        self.created_at = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        # Work deferred to the first request that needs it - not part of cold start
+        self.lazy_phases: Dict[str, float] = {}
+    
+    def record(self, name: str, seconds: float, lazy: bool = False) -> None:
+        (self.lazy_phases if lazy else self.phases)[name] = seconds
+    
+    @contextmanager
+    def phase(self, name: str, lazy: bool = False):
+        """Time a block of startup work under the given phase name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, lazy=lazy)
+    
+    def as_dict(self) -> Dict[str, object]:
+        report = {name: round(seconds * 1000, 2) for name, seconds in self.phases.items()}
+        report["total"] = round(sum(self.phases.values()) * 1000, 2)
+        if self.lazy_phases:
+            report["lazy"] = {name: round(seconds * 1000, 2) for name, seconds in self.lazy_phases.items()}
+        return report
+    
+    def log(self) -> None:
+        report = self.as_dict()
+        breakdown = ", ".join(f"{name}={ms}ms" for name, ms in report.items() if name != "lazy")
+        logger.info("Startup complete: %s", breakdown, extra={"startup_ms": report})
+
+
+# Created on first import of app.main so the import phase is measured too
+startup_report = StartupReport()
@@ -1,6 +1,132 @@
 // JavaScript for Emission Zone Compliance Checker
 
+// Client-side result cache. Entries expire with the server's cache entry, whose
+// remaining lifetime the server sends as X-Result-TTL (0 for estimates).
+const RESULT_CACHE_PREFIX = 'ulez:result:';
+const RESULT_CACHE_MAX_ENTRIES = 50;
+
+// Repeat submits of the same registration within this window are ignored
+const SUBMIT_DEBOUNCE_MS = 500;
+
+// Pause in typing before a complete-looking registration is prefetched
+const PREFETCH_DELAY_MS = 600;
+
+// Current-style UK plate (e.g. AB12CDE) - only these are worth prefetching
+const COMPLETE_REGISTRATION = /^[A-Z]{2}[0-9]{2}[A-Z]{3}$/;
+
+const resultCache = {
+    get(registration) {
+        try {
+            const raw = localStorage.getItem(RESULT_CACHE_PREFIX + registration);
+            if (!raw) {
+                return null;
+            }
+            const entry = JSON.parse(raw);
+            if (!(Date.now() < entry.expiresAt)) {
+                localStorage.removeItem(RESULT_CACHE_PREFIX + registration);
+                return null;
+            }
+            return entry.data;
+        } catch (e) {
+            // Storage disabled or entry corrupt - behave as a cache miss
+            return null;
+        }
+    },
+    
+    set(registration, data, ttlSeconds) {
+        // Estimates made during an upstream outage are never kept
+        if (data.estimated || !(ttlSeconds > 0)) {
+            return;
+        }
+        try {
+            localStorage.setItem(
+                RESULT_CACHE_PREFIX + registration,
+                JSON.stringify({ data: data, expiresAt: Date.now() + ttlSeconds * 1000 })
+            );
+            this.prune();
+        } catch (e) {
+            // Quota exceeded or storage disabled - caching is best effort
+        }
+    },
+    
+    prune() {
+        // Drop expired entries, then the soonest to expire beyond the size limit
+        const entries = [];
+        for (let i = 0; i < localStorage.length; i++) {
+            const key = localStorage.key(i);
+            if (key && key.startsWith(RESULT_CACHE_PREFIX)) {
+                try {
+                    entries.push({ key: key, expiresAt: JSON.parse(localStorage.getItem(key)).expiresAt || 0 });
+                } catch (e) {
+                    entries.push({ key: key, expiresAt: 0 });
+                }
+            }
+        }
+        entries.sort((a, b) => b.expiresAt - a.expiresAt);
+        entries.forEach((entry, index) => {
+            if (index >= RESULT_CACHE_MAX_ENTRIES || entry.expiresAt <= Date.now()) {
+                localStorage.removeItem(entry.key);
+            }
+        });
+    }
+};
+
+// In-flight lookups, so a prefetch and a submit for the same plate share one request
+const inFlight = new Map();
+
+function normaliseRegistration(value) {
+    return value.trim().toUpperCase().replace(/\s/g, '');
+}
+
+function fetchResult(registration) {
+    const cached = resultCache.get(registration);
+    if (cached) {
+        return Promise.resolve(cached);
+    }
+    if (inFlight.has(registration)) {
+        return inFlight.get(registration);
+    }
+    
+    const request = fetch(`/api/${encodeURIComponent(registration)}`)
+        .then(async response => {
+            const data = await response.json();
+            if (!response.ok) {
+                throw new Error(data.detail || 'Error checking compliance');
+            }
+            resultCache.set(registration, data, Number(response.headers.get('X-Result-TTL')));
+            return data;
+        })
+        .finally(() => inFlight.delete(registration));
+    
+    inFlight.set(registration, request);
+    return request;
+}
+
+function escapeHtml(value) {
+    return String(value)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
+function seedCacheFromPage() {
+    // Server-rendered result pages embed their result so a later check is instant
+    const seed = document.getElementById('result-data');
+    if (seed) {
+        try {
+            const data = JSON.parse(seed.textContent);
+            resultCache.set(data.registration, data, Number(seed.dataset.ttl));
+        } catch (e) {
+            // Nothing to seed
+        }
+    }
+}
+
 document.addEventListener('DOMContentLoaded', function() {
+    seedCacheFromPage();
+    
     const form = document.getElementById('check-form');
     const registrationInput = document.getElementById('registration');
     const errorMessage = document.getElementById('error-message');
@@ -8,12 +134,15 @@ document.addEventListener('DOMContentLoaded', function() {
     const resultContainer = document.getElementById('result-container');
     const submitButton = document.getElementById('submit-btn');
     
+    let lastSubmit = { registration: null, at: 0 };
+    let prefetchTimer = null;
+    
     if (form) {
-        form.addEventListener('submit', async function(e) {
+        form.addEventListener('submit', function(e) {
             e.preventDefault();
             
             // Get and validate registration
-            const registration = registrationInput.value.trim().toUpperCase().replace(/\s/g, '');
+            const registration = normaliseRegistration(registrationInput.value);
             
             if (!registration) {
                 showError('Please enter a registration number');
@@ -25,34 +154,86 @@ document.addEventListener('DOMContentLoaded', function() {
                 return;
             }
             
-            // Clear previous results and errors
-            errorMessage.textContent = '';
-            resultContainer.style.display = 'none';
-            resultContainer.innerHTML = '';
-            
-            // Show loading spinner
-            loadingElement.style.display = 'block';
-            submitButton.disabled = true;
+            // Ignore double clicks and repeated Enter presses for the same plate
+            const now = Date.now();
+            if (registration === lastSubmit.registration && now - lastSubmit.at < SUBMIT_DEBOUNCE_MS) {
+                return;
+            }
+            lastSubmit = { registration: registration, at: now };
             
-            try {
-                // Fetch data from API
-                const response = await fetch(`/api/${registration}`);
-                const data = await response.json();
-                
-                if (!response.ok) {
-                    throw new Error(data.detail || 'Error checking compliance');
-                }
-                
-                // Display results
-                displayResults(data);
-            } catch (error) {
-                showError(error.message);
-            } finally {
-                // Hide loading spinner
-                loadingElement.style.display = 'none';
-                submitButton.disabled = false;
+            check(registration, true);
+        });
+        
+        registrationInput.addEventListener('input', function() {
+            clearTimeout(prefetchTimer);
+            const registration = normaliseRegistration(registrationInput.value);
+            if (!COMPLETE_REGISTRATION.test(registration) || resultCache.get(registration)) {
+                return;
             }
+            prefetchTimer = setTimeout(() => {
+                // Warm the cache; errors surface only if the user submits
+                fetchResult(registration).catch(() => {});
+            }, PREFETCH_DELAY_MS);
         });
+        
+        // Back/forward between checked plates renders from the cache, not the server
+        window.addEventListener('popstate', function(e) {
+            const registration = e.state && e.state.registration;
+            if (registration) {
+                registrationInput.value = registration;
+                check(registration, false);
+            } else {
+                registrationInput.value = '';
+                errorMessage.textContent = '';
+                resultContainer.style.display = 'none';
+                resultContainer.innerHTML = '';
+            }
+        });
+        
+        // Deep links like /?reg=AB12CDE render client-side too
+        const linked = normaliseRegistration(new URLSearchParams(window.location.search).get('reg') || '');
+        if (linked) {
+            registrationInput.value = linked;
+            history.replaceState({ registration: linked }, '', window.location.href);
+            check(linked, false);
+        }
+    }
+    
+    async function check(registration, addToHistory) {
+        // Clear previous results and errors
+        errorMessage.textContent = '';
+        resultContainer.style.display = 'none';
+        resultContainer.innerHTML = '';
+        
+        const cached = resultCache.get(registration);
+        if (cached) {
+            // Instant repeat check - no request, no spinner
+            displayResults(cached);
+            if (addToHistory) {
+                history.pushState({ registration: registration }, '', `/?reg=${encodeURIComponent(registration)}`);
+            }
+            return;
+        }
+        
+        // Show loading spinner
+        loadingElement.style.display = 'block';
+        submitButton.disabled = true;
+        
+        try {
+            const data = await fetchResult(registration);
+            
+            // Display results
+            displayResults(data);
+            if (addToHistory) {
+                history.pushState({ registration: registration }, '', `/?reg=${encodeURIComponent(registration)}`);
+            }
+        } catch (error) {
+            showError(error.message);
+        } finally {
+            // Hide loading spinner
+            loadingElement.style.display = 'none';
+            submitButton.disabled = false;
+        }
     }
     
     function showError(message) {
@@ -61,12 +242,23 @@ document.addEventListener('DOMContentLoaded', function() {
         submitButton.disabled = false;
     }
     
+    function formatZoneStatus(zone) {
+        if (zone.compliant) {
+            return 'No charge';
+        }
+        if (!zone.charge) {
+            return 'Not compliant';
+        }
+        const amount = `£${zone.charge.toFixed(2)}`;
+        return zone.charge_type === 'penalty' ? `${amount} penalty` : `${amount} per day`;
+    }
+    
     function displayResults(data) {
-        // Create result HTML
+        // Create result HTML (upstream values are escaped before insertion)
         const resultHTML = `
             <div class="result-header ${data.compliant ? 'compliant' : 'non-compliant'}">
-                <h2>${data.message || (data.compliant ? 'Your vehicle is compliant.' : 'Your vehicle is not compliant.')}</h2>
-                <p class="registration-display">Registration: ${data.registration}</p>
+                <h2>${escapeHtml(data.message || (data.compliant ? 'Your vehicle is compliant.' : 'Your vehicle is not compliant.'))}</h2>
+                <p class="registration-display">Registration: ${escapeHtml(data.registration)}</p>
             </div>
             
             <div class="vehicle-details">
@@ -75,35 +267,42 @@ document.addEventListener('DOMContentLoaded', function() {
                     ${data.make_model ? `
                     <div class="detail-item">
                         <span class="detail-label">Make and Model:</span>
-                        <span class="detail-value">${data.make_model}</span>
+                        <span class="detail-value">${escapeHtml(data.make_model)}</span>
                     </div>
                     ` : ''}
                     
                     ${data.year ? `
                     <div class="detail-item">
                         <span class="detail-label">Year of Registration:</span>
-                        <span class="detail-value">${data.year}</span>
+                        <span class="detail-value">${escapeHtml(data.year)}</span>
                     </div>
                     ` : ''}
                     
                     ${data.engine_category ? `
                     <div class="detail-item">
                         <span class="detail-label">Engine Category:</span>
-                        <span class="detail-value">${data.engine_category}</span>
+                        <span class="detail-value">${escapeHtml(data.engine_category)}</span>
+                    </div>
+                    ` : ''}
+                    
+                    ${data.fuel_type ? `
+                    <div class="detail-item">
+                        <span class="detail-label">Fuel Type:</span>
+                        <span class="detail-value">${escapeHtml(data.fuel_type)}</span>
                     </div>
                     ` : ''}
                     
                     ${data.co2_emissions ? `
                     <div class="detail-item">
                         <span class="detail-label">CO2 Emissions:</span>
-                        <span class="detail-value">${data.co2_emissions}</span>
+                        <span class="detail-value">${escapeHtml(data.co2_emissions)}</span>
                     </div>
                     ` : ''}
                     
                     ${!data.compliant && data.charge ? `
                     <div class="detail-item charge">
                         <span class="detail-label">Daily Charge:</span>
-                        <span class="detail-value">£${data.charge}</span>
+                        <span class="detail-value">£${escapeHtml(data.charge)}</span>
                     </div>
                     ` : ''}
                 </div>
@@ -112,9 +311,23 @@ document.addEventListener('DOMContentLoaded', function() {
             <div class="compliance-summary">
                 ${data.compliant 
                     ? `<p class="compliant-message">This vehicle meets the emission zone standards and no charge applies.</p>`
-                    : `<p class="non-compliant-message">This vehicle does not meet the emission zone standards. ${data.charge ? `A daily charge of £${data.charge} applies when driving in the zone.` : ''}</p>`
+                    : `<p class="non-compliant-message">This vehicle does not meet the emission zone standards. ${data.charge ? `A daily charge of £${escapeHtml(data.charge)} applies when driving in the zone.` : ''}</p>`
                 }
             </div>
+            
+            ${data.zones && data.zones.length ? `
+            <div class="zone-breakdown">
+                <h3>Clean Air Zones</h3>
+                <ul class="zone-list">
+                    ${data.zones.map(zone => `
+                    <li class="zone-item ${zone.compliant ? 'compliant' : 'non-compliant'}">
+                        <span class="zone-name">${escapeHtml(zone.name)}</span>
+                        <span class="zone-status">${formatZoneStatus(zone)}</span>
+                    </li>
+                    `).join('')}
+                </ul>
+            </div>
+            ` : ''}
         `;
         
         // Display results
@@ -0,0 +1,361 @@
+import aiohttp
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from app.config import WatchConfig
+from app.models import UlezResponse
+
+logger = logging.getLogger(__name__)
+
+# Result fields whose change is reported to watchers. The free-text message is
+# left out so rewording it never looks like a change to the vehicle.
+WATCHED_FIELDS = ("compliant", "charge", "make_model", "year", "engine_category", "fuel_type", "co2_emissions")
+
+# Fields every provider sets, where None is a real value (no charge) rather than "not known"
+ALWAYS_SET_FIELDS = ("compliant", "charge")
+
+
+def diff_results(previous: dict, current: dict) -> Dict[str, Dict[str, object]]:
+    """
+    Field-by-field changes between two stored results, zones keyed as zones.<id>.
+    Providers fill in different fields (TfL has no year, fuel or Euro status and
+    only the London ULEZ zone), so a field or zone missing from either side is
+    not a change - only values both results carry are compared.
+    """
+    changes = {}
+    for field in WATCHED_FIELDS:
+        before, after = previous.get(field), current.get(field)
+        if field not in ALWAYS_SET_FIELDS and (before is None or after is None):
+            continue
+        if before != after:
+            changes[field] = {"from": before, "to": after}
+
+    previous_zones = {zone["zone"]: zone for zone in previous.get("zones") or []}
+    current_zones = {zone["zone"]: zone for zone in current.get("zones") or []}
+    for zone_id in previous_zones.keys() & current_zones.keys():
+        before = previous_zones[zone_id]
+        after = current_zones[zone_id]
+        if before != after:
+            changes[f"zones.{zone_id}"] = {"from": before, "to": after}
+    return changes
+
+
+def merge_results(previous: dict, current: dict) -> dict:
+    """The latest known value of every field and zone, keeping older ones the current result lacks"""
+    merged = dict(previous)
+    merged.update({field: value for field, value in current.items() if value is not None or field in ALWAYS_SET_FIELDS})
+    zones = {zone["zone"]: zone for zone in previous.get("zones") or []}
+    zones.update({zone["zone"]: zone for zone in current.get("zones") or []})
+    merged["zones"] = list(zones.values())
+    return merged
+
+
+def webhook_allowed(url: str) -> bool:
+    """Whether a webhook URL is http(s) and points at an allowed host"""
+    parsed = urlparse(url)
+    return (
+        parsed.scheme in ("http", "https")
+        and bool(parsed.hostname)
+        and parsed.hostname.lower() in WatchConfig.WEBHOOK_ALLOWED_HOSTS
+    )
+
+
+class WatchStore:
+    """
+    Watch lists, the last known result per plate and the change log.
+    Kept in a WAL-mode SQLite file so every worker sees the same feed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS watchlists (
+                id TEXT PRIMARY KEY,
+                webhook_url TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS watched (
+                watchlist_id TEXT NOT NULL,
+                registration TEXT NOT NULL,
+                PRIMARY KEY (watchlist_id, registration)
+            );
+            CREATE INDEX IF NOT EXISTS watched_registration ON watched (registration);
+            CREATE TABLE IF NOT EXISTS plates (
+                registration TEXT PRIMARY KEY,
+                last_result TEXT,
+                last_checked REAL NOT NULL DEFAULT 0,
+                retry_at REAL NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS changes (
+                cursor INTEGER PRIMARY KEY AUTOINCREMENT,
+                watchlist_id TEXT NOT NULL,
+                registration TEXT NOT NULL,
+                detected_at REAL NOT NULL,
+                changes TEXT NOT NULL,
+                result TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS changes_watchlist ON changes (watchlist_id, cursor);
+        """)
+
+    def create_watchlist(self, registrations: List[str], webhook_url: Optional[str] = None) -> str:
+        watchlist_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT INTO watchlists (id, webhook_url, created_at) VALUES (?, ?, ?)",
+                (watchlist_id, webhook_url, time.time()),
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO watched (watchlist_id, registration) VALUES (?, ?)",
+                [(watchlist_id, registration) for registration in registrations],
+            )
+            # New plates are due immediately so their baseline is captured
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO plates (registration) VALUES (?)",
+                [(registration,) for registration in registrations],
+            )
+            self._conn.execute("COMMIT")
+        return watchlist_id
+
+    def get_watchlist(self, watchlist_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT webhook_url, created_at FROM watchlists WHERE id = ?", (watchlist_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            registrations = [
+                r[0] for r in self._conn.execute(
+                    "SELECT registration FROM watched WHERE watchlist_id = ? ORDER BY registration", (watchlist_id,)
+                )
+            ]
+            latest = self._conn.execute(
+                "SELECT MAX(cursor) FROM changes WHERE watchlist_id = ?", (watchlist_id,)
+            ).fetchone()[0]
+        return {
+            "id": watchlist_id,
+            "webhook_url": row[0],
+            "created_at": datetime.fromtimestamp(row[1], tz=timezone.utc).isoformat(),
+            "registrations": registrations,
+            "latest_cursor": latest or 0,
+        }
+
+    def delete_watchlist(self, watchlist_id: str) -> bool:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            deleted = self._conn.execute("DELETE FROM watchlists WHERE id = ?", (watchlist_id,)).rowcount
+            self._conn.execute("DELETE FROM watched WHERE watchlist_id = ?", (watchlist_id,))
+            self._conn.execute("DELETE FROM changes WHERE watchlist_id = ?", (watchlist_id,))
+            # Plates nobody watches any more stop costing upstream lookups
+            self._conn.execute("DELETE FROM plates WHERE registration NOT IN (SELECT registration FROM watched)")
+            self._conn.execute("COMMIT")
+        return bool(deleted)
+
+    def due_registrations(self, limit: int, recheck_interval: float) -> List[str]:
+        """Watched plates not checked within the interval and not backing off, stalest first"""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT registration FROM plates WHERE last_checked <= ? AND retry_at <= ? "
+                "ORDER BY last_checked LIMIT ?",
+                (now - recheck_interval, now, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def mark_failed(self, registration: str, retry_backoff: float) -> None:
+        """
+        Record a lookup that produced no result. The plate stays due - a missing
+        baseline or a stale result still needs checking - but is skipped until
+        the backoff has passed, so it is not retried every tick.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE plates SET retry_at = ? WHERE registration = ?", (time.time() + retry_backoff, registration)
+            )
+
+    def record_result(self, registration: str, result: UlezResponse) -> List[Tuple[str, dict]]:
+        """
+        Store a fresh result and log a change for every watch list holding the plate
+        if it differs from the previous one. The first result is only a baseline.
+        The stored result is merged with the previous one, so a sparser answer from
+        another provider does not lose fields for the next comparison.
+        Returns (watchlist id, change event) pairs for webhook delivery.
+        """
+        current = result.model_dump(mode="json")
+        now = time.time()
+        events = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            row = self._conn.execute(
+                "SELECT last_result FROM plates WHERE registration = ?", (registration,)
+            ).fetchone()
+            previous = json.loads(row[0]) if row and row[0] else None
+            changes = diff_results(previous, current) if previous else {}
+            current = merge_results(previous, current) if previous else current
+            self._conn.execute(
+                "UPDATE plates SET last_result = ?, last_checked = ?, retry_at = 0 WHERE registration = ?",
+                (json.dumps(current), now, registration),
+            )
+            if changes:
+                watchlists = [
+                    r[0] for r in self._conn.execute(
+                        "SELECT watchlist_id FROM watched WHERE registration = ?", (registration,)
+                    )
+                ]
+                for watchlist_id in watchlists:
+                    cursor = self._conn.execute(
+                        "INSERT INTO changes (watchlist_id, registration, detected_at, changes, result) VALUES (?, ?, ?, ?, ?)",
+                        (watchlist_id, registration, now, json.dumps(changes), json.dumps(current)),
+                    ).lastrowid
+                    events.append((watchlist_id, self._event(cursor, registration, now, changes, current)))
+            self._conn.execute("COMMIT")
+        return events
+
+    def changes_since(self, watchlist_id: str, cursor: int, limit: int) -> Tuple[List[dict], int]:
+        """Change events after the cursor, oldest first, plus the cursor to resume from"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT cursor, registration, detected_at, changes, result FROM changes "
+                "WHERE watchlist_id = ? AND cursor > ? ORDER BY cursor LIMIT ?",
+                (watchlist_id, cursor, limit),
+            ).fetchall()
+        events = [
+            self._event(row[0], row[1], row[2], json.loads(row[3]), json.loads(row[4]))
+            for row in rows
+        ]
+        next_cursor = events[-1]["cursor"] if events else cursor
+        return events, next_cursor
+
+    def webhook_url(self, watchlist_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT webhook_url FROM watchlists WHERE id = ?", (watchlist_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _event(cursor: int, registration: str, detected_at: float, changes: dict, result: dict) -> dict:
+        return {
+            "cursor": cursor,
+            "registration": registration,
+            "detected_at": datetime.fromtimestamp(detected_at, tz=timezone.utc).isoformat(),
+            "changes": changes,
+            "result": result,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class WatchScheduler:
+    """
+    Re-checks watched plates in the background within an upstream budget.
+    Only one worker process runs it at a time: whoever holds the lock file.
+    """
+
+    def __init__(self, store: WatchStore, lookup: Callable[[str], Awaitable[Optional[UlezResponse]]]):
+        self.store = store
+        self.lookup = lookup
+        self.checks_per_tick = max(1, int(WatchConfig.BUDGET_PER_MINUTE * WatchConfig.TICK_SECONDS / 60))
+        self._lock_file = None
+        self._task: Optional[asyncio.Task] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_file is not None
+
+    def _try_become_leader(self) -> bool:
+        if self._lock_file is not None:
+            return True
+        lock_file = open(f"{self.store.path}.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info("Watch scheduler running in worker %d", os.getpid())
+        return True
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self._try_become_leader():
+                    await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Watch scheduler tick failed: %s", e)
+            await asyncio.sleep(WatchConfig.TICK_SECONDS)
+
+    async def run_once(self) -> int:
+        """Check the stalest due plates, up to this tick's share of the budget"""
+        registrations = self.store.due_registrations(self.checks_per_tick, WatchConfig.RECHECK_INTERVAL)
+        for registration in registrations:
+            result = await self.lookup(registration)
+            if result is None:
+                self.store.mark_failed(registration, WatchConfig.RETRY_BACKOFF)
+                continue
+            events = self.store.record_result(registration, result)
+            for watchlist_id, event in events:
+                await self._notify(watchlist_id, event)
+        return len(registrations)
+
+    async def _notify(self, watchlist_id: str, event: dict) -> None:
+        """Push a change to the watch list's webhook; the cursor feed remains the source of truth"""
+        url = self.store.webhook_url(watchlist_id)
+        if not url:
+            return
+        if not webhook_allowed(url):
+            # Registered before the allowlist changed; the cursor feed still has the event
+            logger.warning("Webhook host for watch list %s is not allowed, skipping delivery", watchlist_id)
+            return
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=WatchConfig.WEBHOOK_TIMEOUT))
+        try:
+            async with self._session.post(url, json={"watchlist_id": watchlist_id, "changes": [event]}) as response:
+                if response.status >= 400:
+                    logger.warning("Webhook for watch list %s returned status %d", watchlist_id, response.status)
+        except Exception as e:
+            logger.warning("Webhook for watch list %s failed: %s", watchlist_id, e)
+
+
+def create_watch_store() -> WatchStore:
+    directory = os.path.dirname(WatchConfig.DB_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return WatchStore(WatchConfig.DB_PATH)
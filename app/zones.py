@@ -0,0 +1,241 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+from app.models import ZoneCompliance
+
+# Vehicle classes the zone schemes distinguish between
+VEHICLE_CLASSES = ("car", "van", "taxi", "motorcycle", "hgv", "bus")
+
+# Minimum Euro standards by fuel - the common CAZ/ULEZ baseline
+PETROL_EURO_4 = {"petrol": 4, "diesel": 6}
+HGV_EURO_6 = {"petrol": 6, "diesel": 6}
+MOTORCYCLE_EURO_3 = {"petrol": 3, "diesel": 3}
+
+# Zone rule definitions. Each entry lists, per vehicle class, the minimum Euro
+# standard per fuel and what a non-compliant vehicle pays. Classes missing from
+# "standards" are not charged in that zone. Scottish LEZs issue penalty notices
+# rather than daily charges.
+ZONES = [
+    {
+        "id": "london-ulez",
+        "name": "London ULEZ",
+        "charge_type": "daily",
+        "standards": {"car": PETROL_EURO_4, "van": PETROL_EURO_4, "taxi": PETROL_EURO_4, "motorcycle": MOTORCYCLE_EURO_3},
+        "charges": {"car": 12.50, "van": 12.50, "taxi": 12.50, "motorcycle": 12.50},
+    },
+    {
+        "id": "london-lez",
+        "name": "London LEZ",
+        "charge_type": "daily",
+        "standards": {"hgv": HGV_EURO_6, "bus": HGV_EURO_6},
+        "charges": {"hgv": 100.00, "bus": 100.00},
+    },
+    {
+        "id": "birmingham-caz",
+        "name": "Birmingham CAZ (Class D)",
+        "charge_type": "daily",
+        "standards": {"car": PETROL_EURO_4, "van": PETROL_EURO_4, "taxi": PETROL_EURO_4, "hgv": HGV_EURO_6, "bus": HGV_EURO_6},
+        "charges": {"car": 8.00, "van": 8.00, "taxi": 8.00, "hgv": 50.00, "bus": 50.00},
+    },
+    {
+        "id": "bristol-caz",
+        "name": "Bristol CAZ (Class D)",
+        "charge_type": "daily",
+        "standards": {"car": PETROL_EURO_4, "van": PETROL_EURO_4, "taxi": PETROL_EURO_4, "hgv": HGV_EURO_6, "bus": HGV_EURO_6},
+        "charges": {"car": 9.00, "van": 9.00, "taxi": 9.00, "hgv": 100.00, "bus": 100.00},
+    },
+    {
+        "id": "bath-caz",
+        "name": "Bath CAZ (Class C)",
+        "charge_type": "daily",
+        "standards": {"van": PETROL_EURO_4, "taxi": PETROL_EURO_4, "hgv": HGV_EURO_6, "bus": HGV_EURO_6},
+        "charges": {"van": 9.00, "taxi": 9.00, "hgv": 100.00, "bus": 100.00},
+    },
+    {
+        "id": "bradford-caz",
+        "name": "Bradford CAZ (Class C)",
+        "charge_type": "daily",
+        "standards": {"van": PETROL_EURO_4, "taxi": PETROL_EURO_4, "hgv": HGV_EURO_6, "bus": HGV_EURO_6},
+        "charges": {"van": 9.00, "taxi": 7.00, "hgv": 50.00, "bus": 50.00},
+    },
+    {
+        "id": "sheffield-caz",
+        "name": "Sheffield CAZ (Class C)",
+        "charge_type": "daily",
+        "standards": {"van": PETROL_EURO_4, "taxi": PETROL_EURO_4, "hgv": HGV_EURO_6, "bus": HGV_EURO_6},
+        "charges": {"van": 10.00, "taxi": 10.00, "hgv": 50.00, "bus": 50.00},
+    },
+    {
+        "id": "newcastle-caz",
+        "name": "Newcastle CAZ (Class C)",
+        "charge_type": "daily",
+        "standards": {"van": PETROL_EURO_4, "taxi": PETROL_EURO_4, "hgv": HGV_EURO_6, "bus": HGV_EURO_6},
+        "charges": {"van": 12.50, "taxi": 12.50, "hgv": 50.00, "bus": 50.00},
+    },
+    {
+        "id": "portsmouth-caz",
+        "name": "Portsmouth CAZ (Class B)",
+        "charge_type": "daily",
+        "standards": {"taxi": PETROL_EURO_4, "hgv": HGV_EURO_6, "bus": HGV_EURO_6},
+        "charges": {"taxi": 10.00, "hgv": 50.00, "bus": 50.00},
+    },
+    {
+        "id": "glasgow-lez",
+        "name": "Glasgow LEZ",
+        "charge_type": "penalty",
+        "standards": {"car": PETROL_EURO_4, "van": PETROL_EURO_4, "taxi": PETROL_EURO_4, "hgv": HGV_EURO_6, "bus": HGV_EURO_6},
+        "charges": {"car": 60.00, "van": 60.00, "taxi": 60.00, "hgv": 60.00, "bus": 60.00},
+    },
+    {
+        "id": "edinburgh-lez",
+        "name": "Edinburgh LEZ",
+        "charge_type": "penalty",
+        "standards": {"car": PETROL_EURO_4, "van": PETROL_EURO_4, "taxi": PETROL_EURO_4, "hgv": HGV_EURO_6, "bus": HGV_EURO_6},
+        "charges": {"car": 60.00, "van": 60.00, "taxi": 60.00, "hgv": 60.00, "bus": 60.00},
+    },
+    {
+        "id": "aberdeen-lez",
+        "name": "Aberdeen LEZ",
+        "charge_type": "penalty",
+        "standards": {"car": PETROL_EURO_4, "van": PETROL_EURO_4, "taxi": PETROL_EURO_4, "hgv": HGV_EURO_6, "bus": HGV_EURO_6},
+        "charges": {"car": 60.00, "van": 60.00, "taxi": 60.00, "hgv": 60.00, "bus": 60.00},
+    },
+    {
+        "id": "dundee-lez",
+        "name": "Dundee LEZ",
+        "charge_type": "penalty",
+        "standards": {"car": PETROL_EURO_4, "van": PETROL_EURO_4, "taxi": PETROL_EURO_4, "hgv": HGV_EURO_6, "bus": HGV_EURO_6},
+        "charges": {"car": 60.00, "van": 60.00, "taxi": 60.00, "hgv": 60.00, "bus": 60.00},
+    },
+]
+
+# First year each Euro standard applied to all new registrations
+EURO_BY_YEAR = {
+    "motorcycle": ((2017, 4), (2007, 3), (2004, 2), (1999, 1)),
+    "hgv": ((2014, 6), (2009, 5), (2006, 4), (2001, 3)),
+    "bus": ((2014, 6), (2009, 5), (2006, 4), (2001, 3)),
+    "default": ((2015, 6), (2011, 5), (2006, 4), (2001, 3), (1997, 2), (1993, 1)),
+}
+
+ROMAN_NUMERALS = {"I": 1, "II": 2, "III": 3, "IV": 4, "V": 5, "VI": 6}
+
+# A zone rule flattened for fast evaluation:
+# (zone id, minimum Euro standard or None if not charged, compliant result, non-compliant result).
+# Both results are built once here and shared, so evaluation allocates nothing per zone.
+ZoneRule = Tuple[str, Optional[int], ZoneCompliance, ZoneCompliance]
+
+
+def _build_rule_table() -> Dict[Tuple[str, str], Tuple[ZoneRule, ...]]:
+    """Precompute every zone's rule for each (vehicle class, fuel) pair"""
+    table = {}
+    for vehicle_class in VEHICLE_CLASSES:
+        for fuel in ("petrol", "diesel", "electric"):
+            rules = []
+            for zone in ZONES:
+                standards = zone["standards"].get(vehicle_class)
+                exempt = standards is None or fuel == "electric"
+                compliant = ZoneCompliance(zone=zone["id"], name=zone["name"], compliant=True)
+                non_compliant = ZoneCompliance(
+                    zone=zone["id"],
+                    name=zone["name"],
+                    compliant=False,
+                    charge=None if exempt else zone["charges"][vehicle_class],
+                    charge_type=None if exempt else zone["charge_type"],
+                )
+                rules.append((zone["id"], None if exempt else standards[fuel], compliant, non_compliant))
+            table[(vehicle_class, fuel)] = tuple(rules)
+    return table
+
+
+RULE_TABLE = _build_rule_table()
+
+
+def normalise_fuel(fuel_type: Optional[str]) -> str:
+    """Map DVLA-style fuel descriptions onto the fuels the rules distinguish"""
+    fuel = (fuel_type or "").lower()
+    # DVLA records diesel as "HEAVY OIL"; "ELECTRIC DIESEL" and "GAS DIESEL" are diesel hybrids
+    if "diesel" in fuel or "heavy oil" in fuel:
+        return "diesel"
+    if "electric" in fuel and "hybrid" not in fuel and "petrol" not in fuel:
+        return "electric"
+    if "hydrogen" in fuel or "fuel cell" in fuel:
+        return "electric"
+    if any(word in fuel for word in ("petrol", "hybrid", "gas", "lpg")):
+        return "petrol"
+    # Missing or unrecognised fuels get the stricter diesel standard, the same
+    # way an unknown Euro standard is treated as non-compliant
+    return "diesel"
+
+
+def normalise_vehicle_class(vehicle_class: Optional[str]) -> str:
+    """Map DVLA body types and EU categories (M1-M3, N1-N3, L) onto the rule classes"""
+    vehicle_class = (vehicle_class or "").lower().strip()
+    if vehicle_class in VEHICLE_CLASSES:
+        return vehicle_class
+    words = set(re.findall(r"[a-z0-9]+", vehicle_class))
+    # Heavy goods must be matched before the generic "goods" wording used for vans
+    if "heavy" in vehicle_class or words & {"hgv", "lorry", "truck", "n2", "n3"}:
+        return "hgv"
+    if words & {"bus", "coach", "minibus", "m2", "m3"}:
+        return "bus"
+    if "goods" in vehicle_class or words & {"van", "lcv", "n1"}:
+        return "van"
+    if words & {"taxi", "hackney"}:
+        return "taxi"
+    if "motorcycle" in vehicle_class or "moped" in vehicle_class or re.fullmatch(r"l\d?[a-e]?", vehicle_class):
+        return "motorcycle"
+    return "car"
+
+
+def parse_euro_standard(euro_status) -> Optional[int]:
+    """Parse values like "6b", "Euro 4", "EURO VI" or 5 into a Euro number"""
+    if euro_status is None:
+        return None
+    if isinstance(euro_status, int):
+        return euro_status
+    text = str(euro_status).strip().upper().replace("EURO", "").strip()
+    match = re.match(r"(\d)", text)
+    if match:
+        return int(match.group(1))
+    match = re.match(r"(VI|IV|V|III|II|I)\b", text)
+    if match:
+        return ROMAN_NUMERALS[match.group(1)]
+    return None
+
+
+def estimate_euro_standard(year: Optional[int], vehicle_class: str = "car") -> Optional[int]:
+    """Estimate the Euro standard from the registration year"""
+    if not year:
+        return None
+    for first_year, standard in EURO_BY_YEAR.get(vehicle_class, EURO_BY_YEAR["default"]):
+        if year >= first_year:
+            return standard
+    return 0
+
+
+def evaluate_zones(
+    euro_status=None,
+    fuel_type: Optional[str] = None,
+    year: Optional[int] = None,
+    vehicle_class: Optional[str] = None,
+    known_compliance: Optional[Dict[str, bool]] = None,
+) -> List[ZoneCompliance]:
+    """
+    Evaluate one vehicle record against every zone using the precomputed rule table.
+    No network calls - the result for each zone is a single comparison.
+    known_compliance lets an authoritative upstream verdict override a zone's rule.
+    """
+    known_compliance = known_compliance or {}
+    vehicle_class = normalise_vehicle_class(vehicle_class)
+    fuel = normalise_fuel(fuel_type)
+    euro = parse_euro_standard(euro_status)
+    if euro is None:
+        euro = estimate_euro_standard(year, vehicle_class)
+
+    results = []
+    for zone_id, min_euro, compliant_result, non_compliant_result in RULE_TABLE[(vehicle_class, fuel)]:
+        # Unknown Euro standard is treated as non-compliant for safety
+        compliant = min_euro is None or (euro is not None and euro >= min_euro)
+        compliant = known_compliance.get(zone_id, compliant)
+        results.append(compliant_result if compliant else non_compliant_result)
+    return results
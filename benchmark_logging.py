@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-request parsing and logging overhead of a Motorway lookup.
+
+"before" replays the original hot path: response.json() into a dict, five
+eagerly formatted f-string INFO lines including the full payload, and .get()
+field extraction. "after" uses parse_motorway_response() with lazy, sampled
+logging. Log output goes to os.devnull so formatting and write cost count but
+the terminal does not.
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.logs import JsonFormatter, SamplingFilter, TEXT_FORMAT, request_logger
+from app.models import UlezResponse
+from app.scraper import parse_motorway_response
+
+ITERATIONS = 20000
+REGISTRATION = "WO15CZY"
+
+# A realistic Motorway payload: the handful of fields we use plus the
+# valuation, history and imagery blocks we do not
+PAYLOAD = json.dumps({
+    "status": "success",
+    "data": {
+        "vrm": REGISTRATION,
+        "make": {"id": 7, "displayName": "BMW", "slug": "bmw"},
+        "model": "330D xDrive M Sport Auto",
+        "year": 2015,
+        "euroStatus": "6b",
+        "fuelType": "DIESEL",
+        "emissions": 142,
+        "isCompliant": False,
+        "colour": "BLACK",
+        "engineSize": 2993,
+        "transmission": "AUTOMATIC",
+        "valuation": {"retail": 14250, "trade": 11900, "private": 13100, "currency": "GBP"},
+        "motHistory": [
+            {"date": f"20{year}-03-14", "mileage": 12000 * (year - 15), "result": "PASS", "advisories": ["Tyre worn close to legal limit"]}
+            for year in range(16, 25)
+        ],
+        "images": [f"https://images.example.com/{REGISTRATION}/{index}.jpg" for index in range(12)],
+    },
+}).encode()
+
+
+def before(logger):
+    """The original parsing and logging path"""
+    logger.info(f"Making direct API call for registration: {REGISTRATION}")
+    logger.info(f"API response status: {200}")
+    data = json.loads(PAYLOAD)
+    logger.info(f"API response data: {data}")
+    if data.get('status') == 'success' and 'data' in data:
+        api_data = data['data']
+        make_display = api_data.get('make', {}).get('displayName', '') if isinstance(api_data.get('make'), dict) else str(api_data.get('make', ''))
+        model = api_data.get('model', '')
+        make_model = f"{make_display} {model}".strip() or None
+        result = UlezResponse(
+            registration=REGISTRATION,
+            compliant=api_data.get('isCompliant', False),
+            make_model=make_model,
+            year=api_data.get('year'),
+            engine_category=api_data.get('euroStatus'),
+            co2_emissions=api_data.get('emissions'),
+            charge=None if api_data.get('isCompliant') else 12.50,
+            message=f"Vehicle is {'compliant' if api_data.get('isCompliant') else 'not compliant'} with ULEZ standards"
+        )
+        logger.info(f"Successfully parsed API response for {REGISTRATION}")
+        logger.info(f"API response for {REGISTRATION} - response time: {0.123:.3f}s")
+        return result
+
+
+def after(logger):
+    """The current parsing and logging path"""
+    logger.info("Making direct API call for registration: %s", REGISTRATION)
+    logger.info("API response status for %s: %d", REGISTRATION, 200)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("API response body for %s: %s", REGISTRATION, PAYLOAD[:2048])
+    result = parse_motorway_response(PAYLOAD, REGISTRATION)
+    logger.info("API response for %s - response time: %.3fs", REGISTRATION, 0.123)
+    return result
+
+
+def configure(logger, formatter, sample_rate):
+    logger.handlers.clear()
+    logger.filters.clear()
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = logging.StreamHandler(open(os.devnull, "w"))
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    if sample_rate < 1.0:
+        logger.addFilter(SamplingFilter(sample_rate))
+
+
+def measure(label, path, formatter, sample_rate=1.0):
+    configure(request_logger, formatter, sample_rate)
+    path(request_logger)  # warm up
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        path(request_logger)
+    per_request_us = (time.perf_counter() - start) / ITERATIONS * 1_000_000
+    print(f"  {label:<42} {per_request_us:8.1f} µs/request")
+    return per_request_us
+
+
+if __name__ == "__main__":
+    text = logging.Formatter(TEXT_FORMAT)
+    print(f"📊 Per-request parse + logging overhead ({ITERATIONS} iterations, {len(PAYLOAD)} byte payload)")
+    print("-" * 66)
+    baseline = measure("before: f-strings, payload at INFO", before, text)
+    lazy = measure("after: lazy logging", after, text)
+    measure("after: lazy logging, JSON sink", after, JsonFormatter())
+    sampled = measure("after: lazy logging, 1% sampled", after, text, sample_rate=0.01)
+    print("-" * 66)
+    print(f"  Lazy logging:        {baseline / lazy:.1f}x less overhead")
+    print(f"  Lazy + 1% sampling:  {baseline / sampled:.1f}x less overhead")
@@ -122,6 +122,7 @@ async def check_compliance_html(request: Request, registration: str):
 
 
 if __name__ == "__main__":
-    # Run the application with uvicorn
+    # Development server - use `python -m app.server` for production
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
+    reload = os.environ.get("RELOAD", "false").lower() == "true"
+    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=reload)
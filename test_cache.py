@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Exercise the result cache backends: TTL expiry, batched hit/miss counters and
+the expired-row sweep. SQLite caches use a temporary file. Run directly or with pytest.
+"""
+
+import sys
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import app.cache as cache_module
+from app.cache import MemoryCache, SqliteCache
+from app.models import UlezResponse
+from test_support import run_tests
+
+
+def vehicle(registration):
+    return UlezResponse(registration=registration, compliant=True, message="cached")
+
+
+@contextmanager
+def temporary_cache_path():
+    with tempfile.TemporaryDirectory() as directory:
+        yield os.path.join(directory, "cache.sqlite3")
+
+
+@contextmanager
+def cache_settings(**overrides):
+    previous = {name: getattr(cache_module, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(cache_module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(cache_module, name, value)
+
+
+def test_memory_cache_ttl():
+    fresh = MemoryCache(ttl=60)
+    fresh.set("AB12CDE", vehicle("AB12CDE"))
+    assert fresh.get("AB12CDE").message == "cached"
+
+    expired = MemoryCache(ttl=0)
+    expired.set("AB12CDE", vehicle("AB12CDE"))
+    assert expired.get("AB12CDE") is None
+    assert len(expired) == 0
+
+
+def test_sqlite_cache_ttl_is_shared_across_workers():
+    with temporary_cache_path() as path:
+        writer = SqliteCache(ttl=60, path=path)
+        # A second connection to the same file stands in for another worker
+        reader = SqliteCache(ttl=60, path=path)
+        expired = SqliteCache(ttl=0, path=path)
+        try:
+            writer.set("AB12CDE", vehicle("AB12CDE"))
+            assert reader.get("AB12CDE").message == "cached"
+            assert reader.keys() == ["AB12CDE"]
+            assert expired.get("AB12CDE") is None
+            assert len(expired) == 0
+        finally:
+            writer.close()
+            reader.close()
+            expired.close()
+
+
+def test_counters_are_batched_and_flushed_on_close():
+    with temporary_cache_path() as path, cache_settings(COUNTER_FLUSH_SECONDS=3600):
+        writer = SqliteCache(ttl=60, path=path)
+        reader = SqliteCache(ttl=60, path=path)
+        try:
+            writer.incr("hits")
+            writer.incr("hits")
+            writer.incr("misses")
+            # Pending increments count for the worker holding them, nobody else yet
+            assert writer.counters() == {"hits": 2, "misses": 1}
+            assert reader.counters() == {}
+
+            writer.close()
+            assert reader.counters() == {"hits": 2, "misses": 1}
+        finally:
+            reader.close()
+
+
+def test_counters_flush_once_interval_elapses():
+    with temporary_cache_path() as path, cache_settings(COUNTER_FLUSH_SECONDS=0):
+        writer = SqliteCache(ttl=60, path=path)
+        reader = SqliteCache(ttl=60, path=path)
+        try:
+            writer.incr("hits")
+            reader.incr("hits")
+            assert reader.counters() == {"hits": 2}
+        finally:
+            writer.close()
+            reader.close()
+
+
+def test_set_purges_expired_rows():
+    with temporary_cache_path() as path, cache_settings(PURGE_INTERVAL_SECONDS=0):
+        writer = SqliteCache(ttl=0.2, path=path)
+        # Long TTL, so it sees every row still in the file
+        reader = SqliteCache(ttl=3600, path=path)
+        try:
+            writer.set("AB12CDE", vehicle("AB12CDE"))
+            time.sleep(0.3)
+            assert writer.get("AB12CDE") is None
+            # Reads leave expired rows alone; the next write sweeps them
+            assert reader.keys() == ["AB12CDE"]
+
+            writer.set("WO15CZY", vehicle("WO15CZY"))
+            assert reader.keys() == ["WO15CZY"]
+        finally:
+            writer.close()
+            reader.close()
+
+
+if __name__ == "__main__":
+    run_tests(
+        test_memory_cache_ttl,
+        test_sqlite_cache_ttl_is_shared_across_workers,
+        test_counters_are_batched_and_flushed_on_close,
+        test_counters_flush_once_interval_elapses,
+        test_set_purges_expired_rows,
+    )
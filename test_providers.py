@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Exercise the data-source pipeline against a local fake upstream server.
+No real network calls are made. Run directly or with pytest.
+"""
+
+import asyncio
+import sys
+import os
+import time
+from collections import deque
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.config import ProviderConfig
+from app.providers import FallbackApiProvider, ProviderRegistry, TflProvider
+from app.scraper import HeuristicProvider, MotorwayProvider
+from test_support import local_server, run_tests
+
+
+async def fake_motorway(request):
+    """Mimics the Motorway ULEZ endpoint; ?delay= and ?status= control behaviour"""
+    await asyncio.sleep(float(request.query.get("delay", "0")))
+    status = int(request.query.get("status", "200"))
+    if status != 200:
+        return web.json_response({"status": "error"}, status=status)
+    body = await request.json()
+    return web.json_response({
+        "status": "success",
+        "data": {
+            "vrm": body["vrm"],
+            "make": {"displayName": "BMW"},
+            "model": "330D",
+            "year": 2015,
+            "euroStatus": "6b",
+            "fuelType": "DIESEL",
+            "isCompliant": True,
+        },
+    })
+
+
+async def fake_fallback(request):
+    """Mimics a generic fallback API returning UlezResponse fields"""
+    await asyncio.sleep(float(request.query.get("delay", "0")))
+    return web.json_response({"compliant": False, "message": "from fallback"})
+
+
+# Verdicts the fake TfL API gives per registration
+TFL_COMPLIANCE = {"WO15CZY": "Compliant", "AB05CDE": "NotCompliant", "XX99XXX": "Exempt"}
+
+
+async def fake_tfl(request):
+    """Mimics the TfL Vehicle API; rejects requests without the expected credentials"""
+    if request.query.get("app_key") != "test-key" or request.query.get("app_id") != "test-id":
+        return web.json_response({"message": "invalid app_key"}, status=403)
+    return web.json_response({
+        "vrm": request.query["vrm"],
+        "type": "Car",
+        "make": "FORD",
+        "model": "FOCUS",
+        "compliance": TFL_COMPLIANCE.get(request.query["vrm"], ""),
+    })
+
+
+FAKE_UPSTREAM_ROUTES = (
+    web.post("/motorway", fake_motorway),
+    web.get("/fallback", fake_fallback),
+    web.get("/tfl", fake_tfl),
+)
+
+
+def make_registry(base_url, policy, motorway_query="", fallback_query="", motorway_priority=10,
+                  timeout=1.0, upstream_deadline=None):
+    registry = ProviderRegistry(policy=policy, upstream_deadline=upstream_deadline)
+    registry.register(MotorwayProvider(
+        url=f"{base_url}/motorway{motorway_query}", priority=motorway_priority, timeout=timeout,
+    ))
+    registry.register(FallbackApiProvider(
+        url=f"{base_url}/fallback{fallback_query}", priority=20, timeout=timeout,
+    ))
+    registry.register(HeuristicProvider())
+    return registry
+
+
+async def resolve_with(policy, **kwargs):
+    async with local_server(*FAKE_UPSTREAM_ROUTES) as base_url:
+        registry = make_registry(base_url, policy, **kwargs)
+        await registry.open_all()
+        try:
+            result = await registry.resolve("WO15CZY")
+            return result, registry.stats()
+        finally:
+            await registry.close_all()
+
+
+def test_tiered_uses_first_tier():
+    result, stats = asyncio.run(resolve_with("tiered"))
+    assert result.make_model == "BMW 330D"
+    assert result.fuel_type == "DIESEL"
+    assert any(zone.zone == "birmingham-caz" and zone.compliant for zone in result.zones)
+    assert stats["motorway"]["successes"] == 1
+    fallback_stats = next(value for name, value in stats.items() if name.startswith("fallback:"))
+    assert fallback_stats["calls"] == 0
+
+
+def test_tiered_falls_through_on_error():
+    result, stats = asyncio.run(resolve_with("tiered", motorway_query="?status=500"))
+    assert result.message == "from fallback"
+    assert stats["motorway"]["failures"] == 1
+
+
+def test_race_returns_fastest():
+    result, stats = asyncio.run(resolve_with(
+        "race", motorway_query="?delay=0.5", fallback_query="?delay=0",
+    ))
+    assert result.message == "from fallback"
+    # The slower provider lost the race and was cancelled, so it is not recorded
+    assert stats["motorway"]["calls"] == 0
+
+
+def test_timeout_falls_back_to_heuristic():
+    result, stats = asyncio.run(resolve_with(
+        "sequential", motorway_query="?delay=2", fallback_query="?delay=2",
+    ))
+    assert "Estimated result" in result.message
+    assert stats["motorway"]["timeouts"] == 1
+
+
+def test_upstream_deadline_leaves_time_for_heuristic():
+    # Two tiers at 2s each would take 4s; the deadline cuts upstream off at 0.5s
+    start = time.perf_counter()
+    result, stats = asyncio.run(resolve_with(
+        "sequential", motorway_query="?delay=3", fallback_query="?delay=3", timeout=2.0, upstream_deadline=0.5,
+    ))
+    assert "Estimated result" in result.message
+    assert time.perf_counter() - start < 1.5
+
+
+def test_lookup_budget_covers_deadline_and_fallbacks():
+    registry = make_registry("http://127.0.0.1:9", "tiered", upstream_deadline=12)
+    assert registry.lookup_budget() == 12 + HeuristicProvider().timeout
+
+
+async def tfl_lookup(registration, app_key="test-key"):
+    async with local_server(*FAKE_UPSTREAM_ROUTES) as base_url:
+        provider = TflProvider(url=f"{base_url}/tfl", app_key=app_key, app_id="test-id", priority=20, timeout=1.0)
+        await provider.open()
+        try:
+            return await provider.fetch(registration)
+        finally:
+            await provider.close()
+
+
+def test_tfl_compliant():
+    result = asyncio.run(tfl_lookup("WO15CZY"))
+    assert result.compliant and result.charge is None
+    assert result.make_model == "FORD FOCUS"
+    assert [zone.zone for zone in result.zones] == ["london-ulez"]
+
+
+def test_tfl_not_compliant():
+    result = asyncio.run(tfl_lookup("AB05CDE"))
+    assert not result.compliant
+    assert result.charge == 12.50
+    assert not result.zones[0].compliant
+
+
+def test_tfl_unexpected_answers_are_not_results():
+    # Unknown verdicts and rejected credentials let the registry move on
+    assert asyncio.run(tfl_lookup("XX99XXX")) is None
+    assert asyncio.run(tfl_lookup("ZZ11ZZZ")) is None
+    assert asyncio.run(tfl_lookup("WO15CZY", app_key="wrong")) is None
+
+
+def test_failing_provider_is_demoted_then_recovers():
+    registry = make_registry("http://127.0.0.1:9", "tiered")
+    motorway = registry.get("motorway")
+    for _ in range(ProviderConfig.UNHEALTHY_MIN_CALLS):
+        motorway.stats.record(0.01, success=False)
+    assert registry.effective_priority(motorway) > motorway.priority
+    assert registry.ordered()[0] is not motorway
+
+    # Failures older than the health window no longer count against it
+    motorway.stats.recent = deque(
+        (timestamp - ProviderConfig.HEALTH_WINDOW_SECONDS - 1, success)
+        for timestamp, success in motorway.stats.recent
+    )
+    assert registry.effective_priority(motorway) == motorway.priority
+    assert registry.stats()["motorway"]["failures"] == ProviderConfig.UNHEALTHY_MIN_CALLS
+
+
+if __name__ == "__main__":
+    run_tests(
+        test_tiered_uses_first_tier,
+        test_tiered_falls_through_on_error,
+        test_race_returns_fastest,
+        test_timeout_falls_back_to_heuristic,
+        test_upstream_deadline_leaves_time_for_heuristic,
+        test_lookup_budget_covers_deadline_and_fallbacks,
+        test_tfl_compliant,
+        test_tfl_not_compliant,
+        test_tfl_unexpected_answers_are_not_results,
+        test_failing_provider_is_demoted_then_recovers,
+    )
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Check the startup report and the /ready probe around the app's startup and
+shutdown hooks. Stores use a temporary directory; no upstream calls are made.
+Run directly or with pytest.
+"""
+
+import asyncio
+import json
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.config import ServerConfig, WatchConfig
+from app.startup import StartupReport
+from test_support import run_tests
+
+
+def test_lazy_phases_are_not_in_total():
+    report = StartupReport()
+    report.record("import", 0.2)
+    report.record("cache", 0.05)
+    report.record("templates", 0.5, lazy=True)
+    with report.phase("watch"):
+        pass
+
+    startup_ms = report.as_dict()
+    assert startup_ms["import"] == 200.0
+    assert startup_ms["total"] == round(startup_ms["import"] + startup_ms["cache"] + startup_ms["watch"], 2)
+    assert startup_ms["lazy"] == {"templates": 500.0}
+
+
+def test_no_lazy_key_before_lazy_work():
+    report = StartupReport()
+    report.record("import", 0.1)
+    assert "lazy" not in report.as_dict()
+
+
+def test_ready_only_after_startup():
+    import app.main as main
+
+    async def run():
+        before = await main.readiness_check()
+        assert before.status_code == 503
+        assert json.loads(before.body)["status"] == "starting"
+
+        # Two full lifespans, as a test runner reusing the app would do
+        for _ in range(2):
+            await main.startup()
+            try:
+                after = await main.readiness_check()
+                body = json.loads(after.body)
+                assert after.status_code == 200
+                assert all(body["checks"].values())
+                assert "upstream_pool" in body["startup_ms"]
+            finally:
+                await main.shutdown()
+            assert (await main.readiness_check()).status_code == 503
+
+        static_mounts = [route for route in main.app.routes if getattr(route, "name", None) == "static"]
+        assert len(static_mounts) == 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        previous = (ServerConfig.CACHE_BACKEND, WatchConfig.DB_PATH)
+        ServerConfig.CACHE_BACKEND = "memory"
+        WatchConfig.DB_PATH = os.path.join(directory, "watch.sqlite3")
+        try:
+            asyncio.run(run())
+        finally:
+            ServerConfig.CACHE_BACKEND, WatchConfig.DB_PATH = previous
+
+
+if __name__ == "__main__":
+    run_tests(
+        test_lazy_phases_are_not_in_total,
+        test_no_lazy_key_before_lazy_work,
+        test_ready_only_after_startup,
+    )
@@ -0,0 +1,34 @@
+"""
+Shared helpers for the test scripts: a local aiohttp server standing in for
+upstream APIs and webhook receivers, and the direct-run test loop.
+"""
+
+from contextlib import asynccontextmanager
+
+from aiohttp import web
+
+
+@asynccontextmanager
+async def local_server(*routes):
+    """
+    Serve the given aiohttp routes (e.g. web.post("/hook", handler)) on a free
+    localhost port and yield the base URL, e.g. http://127.0.0.1:54321.
+    """
+    app = web.Application()
+    app.add_routes(routes)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        yield f"http://{host}:{port}"
+    finally:
+        await runner.cleanup()
+
+
+def run_tests(*tests):
+    """Run test functions in order when a test file is executed directly"""
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
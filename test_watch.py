@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Exercise fleet watch lists: baselines, change detection, cursor paging and
+webhook delivery to a local receiver. No upstream calls are made.
+"""
+
+import asyncio
+import sys
+import os
+import tempfile
+from contextlib import contextmanager
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.config import WatchConfig
+from app.models import UlezResponse
+from app.watch import WatchScheduler, WatchStore, webhook_allowed
+from app.zones import evaluate_zones
+from test_support import local_server, run_tests
+
+
+def vehicle(registration, euro_status):
+    zones = evaluate_zones(euro_status=euro_status, fuel_type="DIESEL")
+    compliant = zones[0].compliant
+    return UlezResponse(
+        registration=registration,
+        compliant=compliant,
+        engine_category=euro_status,
+        charge=None if compliant else 12.50,
+        zones=zones,
+    )
+
+
+def full_result(registration, euro_status):
+    """Shaped like a Motorway answer: every field and every zone"""
+    result = vehicle(registration, euro_status)
+    return result.model_copy(update={"make_model": "BMW 330D", "year": 2015, "fuel_type": "DIESEL"})
+
+
+def tfl_result(registration, compliant):
+    """Shaped like a TfL answer: no year, fuel or Euro status, London ULEZ only"""
+    zones = evaluate_zones(vehicle_class="Car", known_compliance={"london-ulez": compliant})
+    return UlezResponse(
+        registration=registration,
+        compliant=compliant,
+        make_model="BMW 330D",
+        charge=None if compliant else 12.50,
+        zones=[zone for zone in zones if zone.zone == "london-ulez"],
+    )
+
+
+@contextmanager
+def temporary_store():
+    with tempfile.TemporaryDirectory() as directory:
+        store = WatchStore(os.path.join(directory, "watch.sqlite3"))
+        try:
+            yield store
+        finally:
+            store.close()
+
+
+@contextmanager
+def watch_config(**overrides):
+    previous = {name: getattr(WatchConfig, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(WatchConfig, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(WatchConfig, name, value)
+
+
+def test_only_changes_are_recorded():
+    with temporary_store() as store:
+        watchlist_id = store.create_watchlist(["AB12CDE", "WO15CZY"])
+
+        # First results are baselines, repeats are not changes
+        assert store.record_result("AB12CDE", vehicle("AB12CDE", "5")) == []
+        assert store.record_result("AB12CDE", vehicle("AB12CDE", "5")) == []
+        assert store.record_result("WO15CZY", vehicle("WO15CZY", "6")) == []
+
+        events = store.record_result("AB12CDE", vehicle("AB12CDE", "6"))
+        assert len(events) == 1
+        changes = events[0][1]["changes"]
+        assert changes["compliant"] == {"from": False, "to": True}
+        assert "zones.london-ulez" in changes
+
+        feed, next_cursor = store.changes_since(watchlist_id, 0, 100)
+        assert [event["registration"] for event in feed] == ["AB12CDE"]
+        assert store.changes_since(watchlist_id, next_cursor, 100) == ([], next_cursor)
+
+
+def test_answering_provider_change_is_not_a_change():
+    with temporary_store() as store:
+        watchlist_id = store.create_watchlist(["WO15CZY"])
+        assert store.record_result("WO15CZY", full_result("WO15CZY", "6")) == []
+
+        # Motorway timed out, TfL answered with the same verdict and fewer fields
+        assert store.record_result("WO15CZY", tfl_result("WO15CZY", True)) == []
+        # ...and Motorway is back; nothing TfL left out was lost from the baseline
+        assert store.record_result("WO15CZY", full_result("WO15CZY", "6")) == []
+        assert store.changes_since(watchlist_id, 0, 100) == ([], 0)
+
+        # A real change reported by the sparser provider is still detected
+        events = store.record_result("WO15CZY", tfl_result("WO15CZY", False))
+        assert len(events) == 1
+        assert set(events[0][1]["changes"]) == {"compliant", "charge", "zones.london-ulez"}
+        assert events[0][1]["result"]["year"] == 2015
+
+
+def test_cursor_pagination():
+    with temporary_store() as store:
+        watchlist_id = store.create_watchlist(["AB12CDE"])
+        store.record_result("AB12CDE", vehicle("AB12CDE", "4"))
+        for euro_status in ("5", "6", "5", "6"):
+            store.record_result("AB12CDE", vehicle("AB12CDE", euro_status))
+
+        first, cursor = store.changes_since(watchlist_id, 0, 3)
+        second, cursor = store.changes_since(watchlist_id, cursor, 3)
+        assert len(first) == 3 and len(second) == 1
+        assert first[-1]["cursor"] < second[0]["cursor"]
+
+
+def test_successful_result_clears_backoff():
+    with temporary_store() as store:
+        store.create_watchlist(["AB12CDE"])
+        store.mark_failed("AB12CDE", retry_backoff=60)
+        assert store.due_registrations(10, WatchConfig.RECHECK_INTERVAL) == []
+
+        # A result clears the backoff; the plate then waits for the full interval
+        store.record_result("AB12CDE", vehicle("AB12CDE", "6"))
+        assert store.due_registrations(10, WatchConfig.RECHECK_INTERVAL) == []
+        assert store.due_registrations(10, 0) == ["AB12CDE"]
+
+
+def test_webhook_hosts_are_allowlisted():
+    with watch_config(WEBHOOK_ALLOWED_HOSTS=["hooks.example.com"]):
+        assert webhook_allowed("https://hooks.example.com/ulez")
+        assert webhook_allowed("http://HOOKS.example.com:8080/ulez")
+        assert not webhook_allowed("http://169.254.169.254/latest/meta-data/")
+        assert not webhook_allowed("http://localhost/hook")
+        assert not webhook_allowed("ftp://hooks.example.com/ulez")
+
+
+def test_scheduler_respects_budget_and_pushes_webhook():
+    async def run():
+        received = []
+
+        async def receiver(request):
+            received.append(await request.json())
+            return web.Response(status=204)
+
+        registrations = [f"AB{index:02d}CDE" for index in range(5)]
+        euro = {"status": "5"}
+        lookups = []
+
+        async def lookup(registration):
+            lookups.append(registration)
+            return vehicle(registration, euro["status"])
+
+        async with local_server(web.post("/hook", receiver)) as base_url:
+            with temporary_store() as store:
+                watchlist_id = store.create_watchlist(registrations, f"{base_url}/hook")
+                scheduler = WatchScheduler(store, lookup)
+                scheduler.checks_per_tick = 2
+                try:
+                    # Budget caps each tick; every plate gets a baseline eventually
+                    assert await scheduler.run_once() == 2
+                    assert await scheduler.run_once() == 2
+                    assert await scheduler.run_once() == 1
+                    assert await scheduler.run_once() == 0
+                    assert received == []
+
+                    # With no re-check interval every plate is due again
+                    euro["status"] = "6"
+                    with watch_config(RECHECK_INTERVAL=0):
+                        assert await scheduler.run_once() == 2
+                finally:
+                    await scheduler.stop()
+
+        assert len(lookups) == 7
+        assert len(received) == 2
+        assert {payload["watchlist_id"] for payload in received} == {watchlist_id}
+        assert received[0]["changes"][0]["changes"]["compliant"] == {"from": False, "to": True}
+
+    with watch_config(WEBHOOK_ALLOWED_HOSTS=["127.0.0.1"]):
+        asyncio.run(run())
+
+
+def test_failed_lookups_retry_after_backoff():
+    async def run():
+        async def lookup(registration):
+            return None
+
+        with temporary_store() as store:
+            store.create_watchlist(["AB12CDE"])
+            scheduler = WatchScheduler(store, lookup)
+            # Still due after a failure, rather than a full interval later
+            with watch_config(RETRY_BACKOFF=0):
+                assert await scheduler.run_once() == 1
+                assert await scheduler.run_once() == 1
+            # ...but not retried every tick
+            with watch_config(RETRY_BACKOFF=60):
+                assert await scheduler.run_once() == 1
+                assert await scheduler.run_once() == 0
+            await scheduler.stop()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    run_tests(
+        test_only_changes_are_recorded,
+        test_answering_provider_change_is_not_a_change,
+        test_cursor_pagination,
+        test_successful_result_clears_backoff,
+        test_webhook_hosts_are_allowlisted,
+        test_scheduler_respects_budget_and_pushes_webhook,
+        test_failed_lookups_retry_after_backoff,
+    )
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Check the multi-zone rule engine: input normalisation and per-zone charges.
+Pure functions only - no network. Run directly or with pytest.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.zones import evaluate_zones, normalise_fuel, normalise_vehicle_class, parse_euro_standard
+from test_support import run_tests
+
+
+def by_zone(zones):
+    return {zone.zone: zone for zone in zones}
+
+
+def test_parse_euro_standard():
+    assert parse_euro_standard("6b") == 6
+    assert parse_euro_standard("Euro 4") == 4
+    assert parse_euro_standard("EURO VI") == 6
+    assert parse_euro_standard("IV") == 4
+    assert parse_euro_standard(5) == 5
+    assert parse_euro_standard(None) is None
+    assert parse_euro_standard("unknown") is None
+
+
+def test_normalise_fuel():
+    assert normalise_fuel("HEAVY OIL") == "diesel"
+    assert normalise_fuel("ELECTRIC DIESEL") == "diesel"
+    assert normalise_fuel("GAS DIESEL") == "diesel"
+    assert normalise_fuel("Electricity") == "electric"
+    assert normalise_fuel("HYBRID ELECTRIC") == "petrol"
+    assert normalise_fuel("GAS BI-FUEL") == "petrol"
+    assert normalise_fuel("FUEL CELLS") == "electric"
+    # Unknown fuels are assessed strictly, like unknown Euro standards
+    assert normalise_fuel(None) == "diesel"
+    assert normalise_fuel("OTHER") == "diesel"
+
+
+def test_normalise_vehicle_class():
+    assert normalise_vehicle_class("Heavy goods vehicle") == "hgv"
+    assert normalise_vehicle_class("Light goods vehicle") == "van"
+    assert normalise_vehicle_class("N1") == "van"
+    assert normalise_vehicle_class("N2") == "hgv"
+    assert normalise_vehicle_class("N3") == "hgv"
+    assert normalise_vehicle_class("Minibus") == "bus"
+    assert normalise_vehicle_class("L3e") == "motorcycle"
+    assert normalise_vehicle_class("Taxi") == "taxi"
+    assert normalise_vehicle_class(None) == "car"
+
+
+def test_heavy_goods_vehicle_charges():
+    zones = by_zone(evaluate_zones("5", "Diesel", vehicle_class="Heavy goods vehicle"))
+    assert zones["birmingham-caz"].charge == 50.00
+    assert zones["london-lez"].charge == 100.00
+    # ULEZ does not apply to HGVs - the LEZ covers them instead
+    assert zones["london-ulez"].compliant
+
+
+def test_n1_van_charges():
+    zones = by_zone(evaluate_zones("Euro 5", "Diesel", vehicle_class="N1"))
+    assert zones["london-ulez"].charge == 12.50
+    assert zones["bath-caz"].charge == 9.00
+    assert zones["london-lez"].compliant
+
+
+def test_estimated_from_year_and_penalty_zones():
+    zones = by_zone(evaluate_zones(fuel_type="Diesel", year=2010))
+    assert not zones["london-ulez"].compliant
+    assert zones["glasgow-lez"].charge_type == "penalty"
+    # Cars are not charged in class C zones
+    assert zones["bath-caz"].compliant
+
+
+def test_dvla_heavy_oil_euro_5_is_charged():
+    zones = by_zone(evaluate_zones("5", "HEAVY OIL", 2012))
+    assert not zones["london-ulez"].compliant
+    assert zones["birmingham-caz"].charge == 8.00
+    assert zones["glasgow-lez"].charge == 60.00
+
+
+def test_electric_is_exempt_everywhere():
+    zones = evaluate_zones(fuel_type="Electricity", year=2005, vehicle_class="Heavy goods vehicle")
+    assert all(zone.compliant and zone.charge is None for zone in zones)
+
+
+def test_known_compliance_overrides_rule():
+    zones = by_zone(evaluate_zones("6", "Diesel", known_compliance={"london-ulez": False}))
+    assert not zones["london-ulez"].compliant
+    assert zones["birmingham-caz"].compliant
+
+
+if __name__ == "__main__":
+    run_tests(
+        test_parse_euro_standard,
+        test_normalise_fuel,
+        test_normalise_vehicle_class,
+        test_heavy_goods_vehicle_charges,
+        test_n1_van_charges,
+        test_estimated_from_year_and_penalty_zones,
+        test_dvla_heavy_oil_euro_5_is_charged,
+        test_electric_is_exempt_everywhere,
+        test_known_compliance_overrides_rule,
+    )